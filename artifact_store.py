@@ -0,0 +1,136 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+from config import ARTIFACT_DB_PATH
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class ArtifactStore:
+    """SQLite store for generated flashcard decks, quizzes and lesson plans.
+
+    An artifact is identified by (corpus version, kind, generator settings),
+    so every session that opens the same documents with the same settings
+    reuses one stored result. Its items are stored one row each, so pages
+    can be read without loading the whole artifact.
+    """
+
+    def __init__(self, path=ARTIFACT_DB_PATH):
+        self.path = str(path)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """CREATE TABLE IF NOT EXISTS artifacts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                corpus TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                UNIQUE (corpus, kind, settings)
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                artifact_id INTEGER NOT NULL REFERENCES artifacts(id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                key TEXT,
+                body TEXT NOT NULL,
+                PRIMARY KEY (artifact_id, position)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_items_key ON items(artifact_id, key);"""
+        )
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def settings_key(**settings) -> str:
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def find(self, corpus: str, kind: str, **settings) -> Optional[int]:
+        row = self._connection().execute(
+            "SELECT id FROM artifacts WHERE corpus = ? AND kind = ? AND settings = ?",
+            (corpus, kind, self.settings_key(**settings))
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, corpus: str, kind: str, items: Iterable[Tuple[Optional[str], dict]], **settings) -> int:
+        """Store ``items`` as (key, body) pairs in one transaction and return the artifact id.
+
+        A stored artifact is never replaced, since sessions may be reading it:
+        when another writer got there first, its id is returned and ``items``
+        are dropped.
+        """
+        conn = self._connection()
+        rows = [(key, json.dumps(body)) for key, body in items]
+        settings_key = self.settings_key(**settings)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                "INSERT INTO artifacts (corpus, kind, settings, size, created) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(corpus, kind, settings) DO NOTHING",
+                (corpus, kind, settings_key, len(rows), time.time())
+            )
+            if cursor.rowcount == 0:
+                artifact_id = conn.execute(
+                    "SELECT id FROM artifacts WHERE corpus = ? AND kind = ? AND settings = ?",
+                    (corpus, kind, settings_key)
+                ).fetchone()[0]
+                conn.commit()
+                return artifact_id
+            artifact_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO items (artifact_id, position, key, body) VALUES (?, ?, ?, ?)",
+                [(artifact_id, position, key, body) for position, (key, body) in enumerate(rows)]
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return artifact_id
+
+    def size(self, artifact_id: int) -> int:
+        row = self._connection().execute("SELECT size FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+        return row[0] if row else 0
+
+    def page(self, artifact_id: int, offset: int = 0, limit: int = -1) -> List[dict]:
+        rows = self._connection().execute(
+            "SELECT body FROM items WHERE artifact_id = ? AND position >= ? ORDER BY position LIMIT ?",
+            (artifact_id, offset, limit)
+        )
+        return [json.loads(body) for (body,) in rows]
+
+    def first(self, artifact_id: int) -> Optional[dict]:
+        items = self.page(artifact_id, limit=1)
+        return items[0] if items else None
+
+    def keys(self, artifact_id: int) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT key FROM items WHERE artifact_id = ? AND key IS NOT NULL ORDER BY position", (artifact_id,)
+        )
+        return [key for (key,) in rows]
+
+    def by_key(self, artifact_id: int, key: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT body FROM items WHERE artifact_id = ? AND key = ?", (artifact_id, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
@@ -0,0 +1,229 @@
+"""End-to-end app benchmark against deterministic offline fakes (no OpenAI calls).
+
+Measures ingestion throughput (PDFs through DocumentProcessor into
+VectorStore), retrieval latency at several corpus sizes, chat latency through
+ChatEngine.create_chain and stream_answer, and flashcard / quiz / lesson-plan
+generation. The LLM and embedding model are replaced by the fakes in
+``benchmarks/fakes.py``; ``--llm-latency`` and ``--embed-latency`` inject a
+fixed delay per call. All caches point at a scratch directory, so every run
+starts cold.
+
+Fails (exit status 1) when a metric exceeds its budget in
+``config.BENCHMARK_BUDGET_MS``; the budgets are calibrated for the default
+zero-latency fakes. The token splitter needs tiktoken's cl100k_base file,
+so on an offline machine set TIKTOKEN_CACHE_DIR to a directory holding it.
+
+    python benchmarks/bench_app.py [--sizes 1000,10000] [--queries 50] [--json]
+"""
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from langchain_core.documents import Document  # noqa: E402
+from config import BENCHMARK_BUDGET_MS, EMBED_BATCH_SIZE, LOCAL_VECTOR_STORE_BACKEND  # noqa: E402
+from context_packer import pack_context  # noqa: E402
+from embedding_cache import CachedEmbeddings  # noqa: E402
+from lexical_index import INDEX_NAME, BM25Index  # noqa: E402
+from llm_cache import ResponseCache, set_response_cache  # noqa: E402
+from metrics import get_metrics  # noqa: E402
+from semantic_cache import SemanticAnswerCache  # noqa: E402
+from vector_store import VECTOR_STORE_BACKENDS, VectorStore  # noqa: E402
+from chat_engine import ChatEngine  # noqa: E402
+from flashcard_generator import FlashcardGeneratorOpenAI  # noqa: E402
+from learning_tools import LessonPlanGenerator, QuizGenerator  # noqa: E402
+from fakes import FakeChatModel, FakeEmbeddings, fake_sentence  # noqa: E402
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+    }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def bench_ingest(workdir: Path, pdf_dir: Path, copies: int, embeddings) -> dict:
+    uploads = workdir / "uploads"
+    uploads.mkdir()
+    paths = []
+    for copy in range(copies):
+        for pdf in sorted(pdf_dir.glob("**/*.pdf")):
+            target = uploads / f"{copy}-{pdf.name}"
+            shutil.copyfile(pdf, target)
+            paths.append(target)
+    if not paths:
+        raise SystemExit(f"No PDFs found under {pdf_dir}")
+
+    store = VectorStore("bench", embeddings=embeddings, store_dir=workdir / "ingest")
+    seconds, retriever = timed(lambda: store.sync_local_store(paths))
+    chunks = len(retriever.vectorstore.get(include=[])["ids"])
+    return {
+        "files": len(paths),
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(chunks / seconds, 1),
+        "ms_per_chunk": round(seconds * 1000 / chunks, 3),
+    }
+
+
+def build_store(directory: Path, size: int, embeddings):
+    LocalStore = VECTOR_STORE_BACKENDS.get(LOCAL_VECTOR_STORE_BACKEND)
+    vectordb = LocalStore(persist_directory=directory.as_posix(), embedding_function=embeddings)
+    index = BM25Index(directory / INDEX_NAME)
+    for start in range(0, size, EMBED_BATCH_SIZE):
+        ids = [f"chunk-{i}" for i in range(start, min(size, start + EMBED_BATCH_SIZE))]
+        texts = [fake_sentence(chunk_id, 120) for chunk_id in ids]
+        metadatas = [{"source": f"doc-{i // 50}.pdf", "page": i % 50} for i in range(start, start + len(ids))]
+        vectordb.add_texts(texts, metadatas=metadatas, ids=ids)
+        index.add_documents([Document(page_content=text, metadata=metadata)
+                             for text, metadata in zip(texts, metadatas)], ids)
+    # Retrieval runs on the saved, memory-mapped form, as in the app
+    index.save()
+    return VectorStore._retriever(vectordb, BM25Index.load(directory), f"bench-{size}")
+
+
+def bench_retrieval(retriever, queries) -> dict:
+    retriever.invoke(queries[0])  # warm up (memory maps, BM25 arrays)
+    samples = [timed(lambda: retriever.invoke(query))[0] for query in queries]
+    return percentiles(samples)
+
+
+def bench_chat(retriever, queries, chat_model) -> dict:
+    engine = ChatEngine("bench", chat_model=chat_model, semantic_cache=SemanticAnswerCache())
+    chain = engine.create_chain(retriever)
+    invoke = [timed(lambda: chain.invoke(query))[0] for query in queries]
+
+    first_tokens = []
+    stream = []
+    for query in queries:
+        query = f"{query} explained"
+        seconds, _ = timed(lambda: list(engine.stream_answer(retriever, query, on_timing=first_tokens.append)))
+        stream.append(seconds)
+    repeat = [timed(lambda: list(engine.stream_answer(retriever, f"{query} explained")))[0] for query in queries]
+    return {
+        "invoke": percentiles(invoke),
+        "stream": percentiles(stream),
+        "time_to_first_token": percentiles([timing.time_to_first_token for timing in first_tokens]),
+        "semantic_cache_hit": percentiles(repeat),
+    }
+
+
+def bench_generation(retriever, chat_model, cards: int) -> dict:
+    documents = retriever.invoke("course policy exam")
+    contents = [doc.page_content[:200] for doc in retriever.vectorstore.similarity_search("learning model", k=cards)]
+
+    flashcards = FlashcardGeneratorOpenAI("bench", chat_model=chat_model)
+    seconds, deck = timed(lambda: flashcards.generate_flashcards(contents))
+    results = {"flashcards": {"cards": sum(card is not None for card in deck), "seconds": round(seconds, 3)}}
+
+    for name, generator, method in [
+        ("quiz", QuizGenerator("bench", chat_model=chat_model), "generate_quiz"),
+        ("lesson_plan", LessonPlanGenerator("bench", chat_model=chat_model), "generate_plan"),
+    ]:
+        content = pack_context(documents, generator.context_budget(), model=generator.model)
+        seconds, _ = timed(lambda: getattr(generator, method)(content))
+        results[name] = {"seconds": round(seconds, 3)}
+    return results
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def check_budgets(results: dict) -> list:
+    """Return (metric, value, budget) for every metric over its budget, in milliseconds."""
+    flat = flatten(results)
+    failures = []
+    for metric, budget in BENCHMARK_BUDGET_MS.items():
+        value = flat.get(metric)
+        if value is None:
+            continue
+        value_ms = value * 1000 if metric.endswith("seconds") else value
+        if value_ms > budget:
+            failures.append((metric, value_ms, budget))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", type=Path, default=ROOT / "knowledgebase")
+    parser.add_argument("--copies", type=int, default=4, help="times each PDF is ingested under a new name")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated corpus sizes in chunks")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--cards", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per fake LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per fake LLM output word")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per fake embeddings call")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    queries = [fake_sentence(f"query-{i}", 8) for i in range(args.queries)]
+    chat_model = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+
+    workdir = Path(tempfile.mkdtemp(prefix="studybuddy-bench-"))
+    try:
+        set_response_cache(ResponseCache(workdir / "llm.sqlite3"))
+        get_metrics().log_path = workdir / "metrics.jsonl"
+        get_metrics().prometheus_path = None
+
+        def embeddings():
+            return CachedEmbeddings(FakeEmbeddings(latency=args.embed_latency), path=workdir / "embeddings.sqlite3")
+
+        results = {
+            "backend": LOCAL_VECTOR_STORE_BACKEND,
+            "fake_latency": {"llm": args.llm_latency, "token": args.token_latency, "embed": args.embed_latency},
+            "ingest": bench_ingest(workdir, args.pdf_dir, args.copies, embeddings()),
+            "retrieval": {},
+        }
+        retrievers = {}
+        for size in sizes:
+            seconds, retrievers[size] = timed(lambda: build_store(workdir / f"store-{size}", size, embeddings()))
+            results["retrieval"][str(size)] = {"build_seconds": round(seconds, 3),
+                                               **bench_retrieval(retrievers[size], queries)}
+        smallest = retrievers[min(sizes)]
+        results["chat"] = bench_chat(smallest, queries, chat_model)
+        results["generation"] = bench_generation(smallest, chat_model, args.cards)
+    finally:
+        get_metrics().flush()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failures = check_budgets(results)
+    results["budget_failures"] = [{"metric": m, "value_ms": round(v, 2), "budget_ms": b} for m, v, b in failures]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for metric, value in flatten(results).items():
+            if metric != "budget_failures":
+                print(f"{metric:<45} {value}")
+        for metric, value, budget in failures:
+            print(f"OVER BUDGET {metric}: {value:.1f} ms > {budget} ms")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Splitter benchmark: OffsetTokenSplitter vs. the CharacterTextSplitter it replaces.
+
+Splits PDF pages (replicated up to ``--pages``) with both splitters and
+reports throughput and the spread of chunk sizes in tokens.
+
+    python benchmarks/bench_splitter.py [--pdf-dir knowledgebase] [--pages 1000] [--json]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from langchain_text_splitters import CharacterTextSplitter  # noqa: E402
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS  # noqa: E402
+from context_packer import get_encoding  # noqa: E402
+from document_processor import DocumentProcessor  # noqa: E402
+from token_splitter import OffsetTokenSplitter  # noqa: E402
+
+
+def load_pages(pdf_dir: Path, pages: int):
+    docs = list(DocumentProcessor.load_documents_parallel(sorted(pdf_dir.glob('**/*.pdf'))))
+    if not docs:
+        raise SystemExit(f"No PDF pages found under {pdf_dir}")
+    return list(islice(cycle(docs), pages))
+
+
+def size_stats(chunks, encoding):
+    sizes = [len(tokens) for tokens in encoding.encode_ordinary_batch(chunks)]
+    mean = statistics.fmean(sizes)
+    stdev = statistics.pstdev(sizes)
+    return {
+        "chunks": len(sizes),
+        "mean_tokens": round(mean, 1),
+        "stdev_tokens": round(stdev, 1),
+        "cv": round(stdev / mean, 3) if mean else 0.0,
+        "min_tokens": min(sizes),
+        "max_tokens": max(sizes),
+    }
+
+
+def best_of(repeat: int, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", type=Path, default=ROOT / "knowledgebase")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    pages = load_pages(args.pdf_dir, args.pages)
+    texts = [page.page_content for page in pages]
+    megabytes = sum(len(text.encode("utf-8")) for text in texts) / 1e6
+    encoding = get_encoding()
+
+    character = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    char_seconds, char_chunks = best_of(args.repeat, lambda: character.split_documents(pages))
+
+    token = OffsetTokenSplitter(chunk_tokens=CHUNK_TOKENS)
+    token_seconds, token_chunks = best_of(args.repeat, lambda: token.split_documents(pages))
+
+    results = {"pages": len(pages), "megabytes": round(megabytes, 2)}
+    for name, seconds, chunks in [
+        ("character", char_seconds, [chunk.page_content for chunk in char_chunks]),
+        ("token", token_seconds, [chunk.page_content for chunk in token_chunks]),
+    ]:
+        results[name] = {
+            "seconds": round(seconds, 4),
+            "pages_per_second": round(len(pages) / seconds, 1),
+            "mb_per_second": round(megabytes / seconds, 2),
+            **size_stats(chunks, encoding),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{results['pages']} pages, {results['megabytes']} MB")
+        for name in ("character", "token"):
+            r = results[name]
+            print(f"{name:<10} {r['seconds']:>8.3f} s  {r['pages_per_second']:>9.1f} pages/s  "
+                  f"{r['chunks']:>6} chunks  tokens {r['mean_tokens']:.0f} ± {r['stdev_tokens']:.0f} "
+                  f"(cv {r['cv']}, {r['min_tokens']}-{r['max_tokens']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Deterministic offline stand-ins for ChatOpenAI and OpenAIEmbeddings.
+
+Both return the same output for the same input and can sleep a fixed time
+per call (and per token or text) to model network and generation latency,
+so benchmarks measure the app's own overhead on top of a known baseline.
+"""
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+_WORD = re.compile(r"\w+")
+_CHUNK_NUMBER = re.compile(r"^Chunk (\d+):", re.MULTILINE)
+
+VOCABULARY = (
+    "learning model prompt gradient retrieval vector context token attention layer training data "
+    "evaluation student course policy exam grade semester credit handbook lecture assignment "
+    "embedding transformer language generation question answer concept example summary review"
+).split()
+
+
+def fake_sentence(seed: str, words: int) -> str:
+    """A deterministic pseudo-sentence of ``words`` words drawn from VOCABULARY."""
+    return " ".join(random.Random(seed).choices(VOCABULARY, k=words))
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that recognises this app's prompts and answers in the expected format.
+
+    ``latency`` is slept once per call (time to first token) and
+    ``token_latency`` once per output word, for both invoke and stream.
+    ``calls`` counts the calls that reached the model.
+    """
+
+    model_name: str = "fake-chat"
+    latency: float = 0.0
+    token_latency: float = 0.0
+    answer_words: int = 60
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _count_call(self):
+        with self._lock:
+            self._calls += 1
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def respond(self, prompt: str) -> str:
+        if '"flashcards": [' in prompt:
+            count = len(_CHUNK_NUMBER.findall(prompt))
+            return json.dumps({"flashcards": [self._card(f"{prompt}{i}", chunk=i) for i in range(1, count + 1)]})
+        if "input_expression" in prompt:
+            return f"```json\n{json.dumps(self._card(prompt))}\n```"
+        if "week_plan" in prompt:
+            plan = {
+                "week_plan": " ".join(f"Day {day}: {fake_sentence(f'{prompt}{day}', 12)}." for day in range(1, 8)),
+                "topics": fake_sentence(f"{prompt}topics", 15),
+                "resources": fake_sentence(f"{prompt}resources", 15),
+            }
+            return f"```json\n{json.dumps(plan)}\n```"
+        if '"questions"' in prompt:
+            quiz = {
+                "questions": [fake_sentence(f"{prompt}q{i}", 12) + "?" for i in range(5)],
+                "answers": [fake_sentence(f"{prompt}a{i}", 20) for i in range(5)],
+                "difficulty": [("easy", "medium", "hard")[i % 3] for i in range(5)],
+            }
+            return f"```json\n{json.dumps(quiz)}\n```"
+        if "study notes" in prompt:
+            return "\n".join(f"- {fake_sentence(f'{prompt}{i}', 12)}" for i in range(8))
+        return fake_sentence(prompt, self.answer_words) + "."
+
+    @staticmethod
+    def _card(seed: str, **extra) -> dict:
+        return {
+            **extra,
+            "input_expression": fake_sentence(f"{seed}in", 8) + "?",
+            "output_expression": fake_sentence(f"{seed}out", 25),
+            "example_usage": fake_sentence(f"{seed}ex", 15),
+            "source": "fake",
+        }
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._count_call()
+        text = self.respond(self._prompt(messages))
+        time.sleep(self.latency + self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self._count_call()
+        text = self.respond(self._prompt(messages))
+        time.sleep(self.latency)
+        for i, word in enumerate(text.split(" ")):
+            time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words embeddings: texts sharing words get similar vectors,
+    so retrieval quality behaves plausibly without a model."""
+
+    def __init__(self, dim: int = 256, latency: float = 0.0, text_latency: float = 0.0):
+        self.model = f"fake-embeddings-{dim}"
+        self.dim = dim
+        self.latency = latency
+        self.text_latency = text_latency
+        self.calls = 0
+        self.texts = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in _WORD.findall(text.lower()):
+            value = zlib.crc32(word.encode("utf-8"))
+            vector[value % self.dim] += 1.0 if value & 1 << 31 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.latency + self.text_latency * len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
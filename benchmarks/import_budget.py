@@ -0,0 +1,62 @@
+"""Startup benchmark: measure the import time of each app module in a fresh interpreter.
+
+Fails (exit status 1) when a module's cumulative import time exceeds its
+budget in ``config.IMPORT_TIME_BUDGET_MS``.
+
+    python benchmarks/import_budget.py [--repeat 3] [--json]
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import IMPORT_TIME_BUDGET_MS  # noqa: E402
+
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\S.*)$")
+
+
+def measure(module: str) -> float:
+    """Return the cumulative import time of ``module`` in milliseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match and match.group(3).strip() == module:
+            return int(match.group(2)) / 1000
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module; the fastest is kept")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for module, budget in IMPORT_TIME_BUDGET_MS.items():
+        elapsed = min(measure(module) for _ in range(args.repeat))
+        ok = elapsed <= budget
+        failed |= not ok
+        results[module] = {"ms": round(elapsed, 1), "budget_ms": budget, "ok": ok}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, result in results.items():
+            status = "ok" if result["ok"] else "OVER BUDGET"
+            print(f"{module:<24} {result['ms']:>9.1f} ms  (budget {result['budget_ms']} ms)  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Load test for the HTTP API (server.py) against deterministic offline fakes (no OpenAI calls).
+
+Starts the API in-process on a free port with the fake LLM and embeddings
+from ``benchmarks/fakes.py``, uploads the PDFs in ``--pdf-dir`` through
+POST /corpora and waits for the ingestion job. It then runs three scenarios:
+
+- burst: ``--clients`` identical quiz requests at once, like a class opening
+  the same quiz. With coalescing this costs one upstream LLM call.
+- chat: ``--clients`` concurrent clients each send ``--requests`` questions
+  drawn from ``--distinct`` queries, so popular questions repeat.
+- overload: more distinct slow chat requests than ``--workers`` plus
+  ``--max-pending`` can hold. The excess must get 503 instead of queueing.
+
+Reports throughput, latency percentiles, upstream LLM calls and status codes.
+Exits 1 if the burst took more than one LLM call (unless ``--no-coalesce``)
+or the overload saw errors other than 503. All stores point at a scratch
+directory. Like bench_app.py, the token splitter needs tiktoken's cl100k_base file.
+
+    python benchmarks/load_server.py [--clients 40] [--llm-latency 0.2] [--no-coalesce] [--json]
+"""
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+import workspace  # noqa: E402
+from artifact_store import ArtifactStore  # noqa: E402
+from embedding_cache import CachedEmbeddings  # noqa: E402
+from jobs import JobRunner  # noqa: E402
+from llm_cache import ResponseCache, set_response_cache  # noqa: E402
+from metrics import get_metrics  # noqa: E402
+from semantic_cache import SemanticAnswerCache  # noqa: E402
+from vector_store import VectorStore  # noqa: E402
+from chat_engine import ChatEngine  # noqa: E402
+from flashcard_generator import FlashcardGeneratorOpenAI  # noqa: E402
+from learning_tools import LessonPlanGenerator, QuizGenerator  # noqa: E402
+from server import StudyService, create_app  # noqa: E402
+from fakes import FakeChatModel, FakeEmbeddings, fake_sentence  # noqa: E402
+
+
+def summarize(samples, statuses, seconds, calls) -> dict:
+    ordered = sorted(samples)
+    return {
+        "requests": len(samples),
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(samples) / seconds, 1),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 1),
+        "llm_calls": calls,
+        "status": dict(sorted(Counter(statuses).items())),
+    }
+
+
+async def timed_post(session, url, payload):
+    start = time.perf_counter()
+    async with session.post(url, json=payload) as response:
+        await response.read()
+        return time.perf_counter() - start, response.status
+
+
+async def scenario(session, chat_model, requests):
+    """Fire ``requests`` [(url, payload)] concurrently."""
+    calls = chat_model.calls
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed_post(session, url, payload) for url, payload in requests))
+    seconds = time.perf_counter() - start
+    return summarize([r[0] for r in results], [r[1] for r in results], seconds, chat_model.calls - calls)
+
+
+async def chat_clients(session, chat_model, base, clients, per_client, queries):
+    async def client(seed):
+        rng = random.Random(seed)
+        results = []
+        for _ in range(per_client):
+            results.append(await timed_post(session, f"{base}/chat", {"query": rng.choice(queries)}))
+        return results
+
+    calls = chat_model.calls
+    start = time.perf_counter()
+    results = [r for batch in await asyncio.gather(*(client(i) for i in range(clients))) for r in batch]
+    seconds = time.perf_counter() - start
+    return summarize([r[0] for r in results], [r[1] for r in results], seconds, chat_model.calls - calls)
+
+
+async def ingest(session, url, pdf_dir: Path) -> str:
+    form = aiohttp.FormData()
+    pdfs = sorted(pdf_dir.glob("**/*.pdf"))
+    if not pdfs:
+        raise SystemExit(f"No PDFs found under {pdf_dir}")
+    for pdf in pdfs:
+        form.add_field("files", pdf.read_bytes(), filename=pdf.name, content_type="application/pdf")
+    async with session.post(f"{url}/corpora", data=form) as response:
+        submitted = await response.json()
+    while True:
+        async with session.get(f"{url}/jobs/{submitted['job']}") as response:
+            job = await response.json()
+        if not job["active"]:
+            break
+        await asyncio.sleep(0.1)
+    if job["status"] != "done":
+        raise SystemExit(f"Ingestion {job['status']}: {job['error']}")
+    return submitted["corpus"]
+
+
+async def run(args, workdir: Path) -> dict:
+    chat_model = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+    embeddings = CachedEmbeddings(FakeEmbeddings(latency=args.embed_latency), path=workdir / "embeddings.sqlite3")
+    service = StudyService(
+        "bench",
+        vector_store=VectorStore("bench", embeddings=embeddings, store_dir=workdir / "store"),
+        chat_engine=ChatEngine("bench", chat_model=chat_model, semantic_cache=SemanticAnswerCache()),
+        generators={
+            "flashcards": FlashcardGeneratorOpenAI("bench", chat_model=chat_model),
+            "quiz": QuizGenerator("bench", chat_model=chat_model),
+            "lesson_plan": LessonPlanGenerator("bench", chat_model=chat_model),
+        },
+        job_runner=JobRunner(workdir / "jobs.sqlite3"),
+        artifact_store=ArtifactStore(workdir / "artifacts.sqlite3"),
+        workers=args.workers,
+        max_pending=args.max_pending,
+        coalesce=not args.no_coalesce,
+    )
+    runner = web.AppRunner(create_app(service), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}"
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            corpus = await ingest(session, url, args.pdf_dir)
+            base = f"{url}/corpora/{corpus}"
+            await timed_post(session, f"{base}/search", {"query": "warm up"})
+
+            results = {"coalesce": not args.no_coalesce, "workers": args.workers, "max_pending": args.max_pending}
+            results["burst"] = await scenario(session, chat_model, [(f"{base}/quiz", {})] * args.clients)
+            queries = [fake_sentence(f"query-{i}", 8) for i in range(args.distinct)]
+            results["chat"] = await chat_clients(session, chat_model, base, args.clients, args.requests, queries)
+
+            # Slow every call down so requests pile up behind the workers
+            chat_model.latency = max(args.llm_latency, 0.2)
+            overload = args.workers + args.max_pending + args.clients
+            results["overload"] = await scenario(session, chat_model, [
+                (f"{base}/chat", {"query": f"overload {i} {fake_sentence(f'overload-{i}', 8)}"})
+                for i in range(overload)
+            ])
+            async with session.get(f"{url}/healthz") as response:
+                results["server"] = await response.json()
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def check(results: dict) -> list:
+    failures = []
+    if results["coalesce"] and results["burst"]["llm_calls"] > 1:
+        failures.append(f"burst made {results['burst']['llm_calls']} LLM calls, expected 1")
+    statuses = results["overload"]["status"]
+    if any(status not in (200, 503) for status in statuses):
+        failures.append(f"overload returned {statuses}")
+    if 503 not in statuses:
+        failures.append("overload was never turned away with 503")
+    if set(results["burst"]["status"]) != {200} or set(results["chat"]["status"]) != {200}:
+        failures.append("burst or chat requests failed")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", type=Path, default=ROOT / "knowledgebase")
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=10, help="chat requests per client")
+    parser.add_argument("--distinct", type=int, default=20, help="distinct chat questions")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-pending", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per fake LLM output word")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per fake embeddings call")
+    parser.add_argument("--no-coalesce", action="store_true", help="turn off single-flight coalescing")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="studybuddy-load-"))
+    try:
+        set_response_cache(ResponseCache(workdir / "llm.sqlite3"))
+        get_metrics().log_path = workdir / "metrics.jsonl"
+        get_metrics().prometheus_path = None
+        workspace.CORPUS_STORE_DIR = workdir / "corpora"
+        workspace.TMP_DIR = workdir / "uploads"
+        results = asyncio.run(run(args, workdir))
+    finally:
+        get_metrics().flush()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failures = check(results)
+    results["failures"] = failures
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name in ("burst", "chat", "overload"):
+            print(f"{name:<9} {json.dumps(results[name])}")
+        print(f"server    {json.dumps(results['server'])}")
+        for failure in failures:
+            print(f"FAILED {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,117 @@
+import hashlib
+import logging
+import time
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
+from llm_cache import stream_cached
+from models import QueryTiming
+from metrics import stage
+from semantic_cache import get_semantic_cache
+from config import DEFAULT_MODEL, SEMANTIC_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
 
 class ChatEngine:
-    def __init__(self, openai_api_key: str):
-        self.llm = ChatOpenAI(
-            model_name="gpt-3.5-turbo",
+    def __init__(self, openai_api_key: str, model: str = DEFAULT_MODEL, http_client=None, semantic_cache=None,
+                 chat_model=None):
+        self.llm = chat_model or ChatOpenAI(
+            model_name=model,
             openai_api_key=openai_api_key,
-            temperature=0
+            temperature=0,
+            http_client=http_client,
+            stream_usage=True
         )
-
-    def create_chain(self, retriever):
         template = """Answer the question based only on the following context:
         {context}
         
         Question: {question}
         """
-        prompt = ChatPromptTemplate.from_template(template)
-        
-        chain = (
-            {"context": retriever, "question": RunnablePassthrough()}
-            | prompt
-            | self.llm
-            | StrOutputParser()
+        self.prompt = ChatPromptTemplate.from_template(template)
+        self.semantic_cache = semantic_cache or get_semantic_cache()
+
+    def create_chain(self, retriever):
+        """Runnable answering a query in one piece, with the same retrieval and caches as ``stream_answer``."""
+        return RunnableLambda(lambda query: "".join(self.stream_answer(retriever, query)))
+
+    def stream_answer(self, retriever, query: str, on_timing=None):
+        """Yield the answer token by token, then pass its QueryTiming to ``on_timing``.
+
+        The engine is shared between sessions, so timings are handed back per
+        call instead of being stored on the instance.
+        """
+        start = time.perf_counter()
+        # The lexical fast path answers without embedding the query, so the
+        # semantic cache only runs when dense retrieval would embed it anyway
+        lexical = self._lexical_probe(retriever, query)
+        lexical_ids, confident = None, False
+        if lexical is not None:
+            lexical_ids = [chunk_id for chunk_id, _ in lexical[0]] or None
+            confident = lexical[1]
+        query_embedding, corpus_version = (None, None) if confident else self._semantic_key(retriever, query)
+        cached = None
+        if query_embedding is not None:
+            with stage('semantic_cache') as record:
+                cached = self.semantic_cache.lookup(query_embedding, corpus_version, lexical_ids)
+                record.cache_hits, record.cache_misses = (1, 0) if cached is not None else (0, 1)
+            logger.info(f"Semantic cache: {self.semantic_cache.stats()}")
+
+        if cached is not None:
+            context = []
+            tokens = [cached.answer]
+        else:
+            context = self._retrieve(retriever, query, lexical)
+            messages = self.prompt.format_messages(context=context, question=query)
+            tokens = stream_cached(self.llm, messages)
+
+        first_token = None
+        answer = []
+        for token in tokens:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            answer.append(token)
+            yield token
+
+        if cached is None and query_embedding is not None:
+            chunk_ids = [self._chunk_id(doc) for doc in context]
+            self.semantic_cache.add(query_embedding, chunk_ids, "".join(answer), corpus_version)
+
+        total = time.perf_counter() - start
+        timing = QueryTiming(
+            query=query,
+            time_to_first_token=first_token if first_token is not None else total,
+            total_latency=total,
+            cached=cached is not None
         )
-        return chain
+        logger.info(f"Chat latency: first token {timing.time_to_first_token:.3f}s, total {total:.3f}s")
+        if on_timing is not None:
+            on_timing(timing)
+
+    @staticmethod
+    def _lexical_probe(retriever, query: str):
+        """Return (BM25 top-k hits, whether the lexical fast path applies) for hybrid retrievers, else None."""
+        lexical_hits = getattr(retriever, 'lexical_hits', None)
+        return lexical_hits(query) if lexical_hits is not None else None
+
+    def _semantic_key(self, retriever, query: str):
+        """Return (query embedding, corpus version), or (None, None) when the cache can't apply."""
+        corpus_version = (getattr(retriever, 'metadata', None) or {}).get('corpus_version')
+        embeddings = getattr(getattr(retriever, 'vectorstore', None), 'embeddings', None)
+        if not SEMANTIC_CACHE_ENABLED or not corpus_version or embeddings is None or not query.strip():
+            return None, None
+        return embeddings.embed_query(query), corpus_version
+
+    @staticmethod
+    def _chunk_id(doc) -> str:
+        # The ingest chunk ID, which the lexical index uses as well
+        chunk_id = doc.metadata.get('chunk_id') or doc.id
+        return chunk_id or hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _retrieve(retriever, query: str, lexical=None):
+        with stage('retrieve') as record:
+            # The BM25 hits from the probe are reused rather than searched again
+            documents = retriever.retrieve(query, lexical) if lexical is not None else retriever.invoke(query)
+            record.items = len(documents)
+            record.bytes = sum(len(doc.page_content.encode('utf-8')) for doc in documents)
+        return documents
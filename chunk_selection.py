@@ -0,0 +1,97 @@
+from typing import List, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from config import FLASHCARD_SELECTION, MMR_LAMBDA, KMEANS_ITERATIONS, MIN_SELECTION_CHARS
+
+
+def stored_chunks(vectordb) -> Tuple[List[Document], np.ndarray]:
+    """All chunks in a local store with their stored embeddings (no embedding calls)."""
+    data = vectordb.get(include=['documents', 'metadatas', 'embeddings'])
+    docs = [Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas'])]
+    return docs, np.asarray(data['embeddings'], dtype=np.float32)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_select(embeddings: np.ndarray, n: int, lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """Greedy max-marginal-relevance order without a query.
+
+    Relevance is similarity to the corpus centroid, so picks start from central
+    content and then move to whatever is least similar to what was already
+    chosen. The result is in pick order, most useful first.
+    """
+    vectors = _normalize(embeddings)
+    n = min(n, len(vectors))
+    if n == 0:
+        return []
+    relevance = vectors @ _normalize(vectors.mean(axis=0, keepdims=True))[0]
+    max_similarity = np.full(len(vectors), -np.inf)
+    chosen = np.zeros(len(vectors), dtype=bool)
+    selected = []
+    for _ in range(n):
+        redundancy = np.where(np.isinf(max_similarity), 0.0, max_similarity)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[chosen] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        chosen[pick] = True
+        max_similarity = np.maximum(max_similarity, vectors @ vectors[pick])
+    return selected
+
+
+def kmeans_select(embeddings: np.ndarray, n: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> List[int]:
+    """Cluster with spherical k-means and return the chunk nearest each centroid, largest cluster first."""
+    vectors = _normalize(embeddings)
+    n = min(n, len(vectors))
+    if n == 0:
+        return []
+    rng = np.random.default_rng(seed)
+
+    # k-means++ initialisation on cosine distance
+    centroids = [vectors[rng.integers(len(vectors))]]
+    for _ in range(1, n):
+        distance = 1 - np.max(vectors @ np.array(centroids).T, axis=1)
+        distance = np.clip(distance, 0, None)
+        total = distance.sum()
+        probabilities = distance / total if total > 0 else None
+        centroids.append(vectors[rng.choice(len(vectors), p=probabilities)])
+    centroids = np.array(centroids)
+
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        updated = np.zeros_like(centroids)
+        np.add.at(updated, labels, vectors)
+        empty = ~updated.any(axis=1)
+        updated[empty] = centroids[empty]
+        updated = _normalize(updated)
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+
+    similarity = vectors @ centroids.T
+    labels = np.argmax(similarity, axis=1)
+    sizes = np.bincount(labels, minlength=n)
+    selected = []
+    for cluster in np.argsort(-sizes):
+        if sizes[cluster] == 0:
+            continue
+        members = np.flatnonzero(labels == cluster)
+        selected.append(int(members[np.argmax(similarity[members, cluster])]))
+    return selected
+
+
+def select_diverse_chunks(vectordb, n: int, method: str = FLASHCARD_SELECTION) -> List[Document]:
+    """Pick ``n`` chunks that cover distinct topics, using the embeddings already in the store."""
+    docs, embeddings = stored_chunks(vectordb)
+    keep = [i for i, doc in enumerate(docs) if len(doc.page_content.strip()) >= MIN_SELECTION_CHARS]
+    if not keep:
+        return []
+    docs = [docs[i] for i in keep]
+    embeddings = embeddings[keep]
+    select = kmeans_select if method == 'kmeans' else mmr_select
+    return [docs[i] for i in select(embeddings, n)]
@@ -0,0 +1,156 @@
+"""Headless batch build of corpus indexes and study artifacts for a directory of PDFs.
+
+Each directory holding PDFs becomes one corpus (``--group tree`` makes the
+whole tree one corpus), the same unit the app indexes from an upload.
+Indexes go to the shared corpus store under the hash of the documents'
+contents and are pinned against garbage collection; flashcards, quizzes and
+lesson plans go to the artifact store. A session that uploads the same PDFs
+therefore opens them without building anything.
+
+Reruns are cheap and resume interrupted builds: a corpus whose index and
+artifacts all exist is skipped, finished artifacts are kept, and chunks
+embedded before an interruption come back from the embedding cache. Ctrl-C
+stops in-flight corpora at their next checkpoint.
+
+    python cli.py knowledgebase/ [--group dir|tree] [--workers 2] [--pdf-workers 4]
+                  [--llm-concurrency 5] [--artifacts flashcards,quiz,lesson_plan] [--whole-corpus] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List
+
+import resources
+import workspace
+from ingest_pipeline import IngestCancelled
+from study_artifacts import build_flashcards, build_lesson_plan, build_quiz
+from vector_store import VectorStore
+from config import DEFAULT_MODEL, FLASHCARD_CONCURRENCY, PDF_WORKERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARTIFACTS = ('flashcards', 'quiz', 'lesson_plan')
+
+
+def find_corpora(root: Path, group: str = 'dir') -> List[List[Path]]:
+    """PDFs under ``root``, one list per corpus, in a stable order."""
+    pdfs = sorted(path for path in root.rglob('*') if path.suffix.lower() == '.pdf' and path.is_file())
+    if group == 'tree':
+        return [pdfs] if pdfs else []
+    by_dir = {}
+    for path in pdfs:
+        by_dir.setdefault(path.parent, []).append(path)
+    return [by_dir[directory] for directory in sorted(by_dir)]
+
+
+def build_corpus(paths: List[Path], vector_store: VectorStore, generators: dict, kinds=ARTIFACTS,
+                 whole_corpus: bool = False, llm_concurrency: int = FLASHCARD_CONCURRENCY,
+                 cancel: threading.Event = None) -> dict:
+    """Build (or find) the index and the ``kinds`` artifacts of one corpus and summarise what happened."""
+    start = time.perf_counter()
+    store_dir = vector_store.corpus_dir(paths)
+    summary = {'corpus': store_dir.name, 'directory': os.path.commonpath([path.parent for path in paths]),
+               'files': len(paths), 'status': 'up to date', 'artifacts': {}}
+    try:
+        names = [path.name for path in paths]
+        if len(set(names)) != len(names):
+            # The ingest manifest tracks files by name
+            raise ValueError("PDFs with the same file name cannot share a corpus; use --group dir")
+        if not workspace.is_ready(store_dir):
+            summary['status'] = 'built'
+        retriever = vector_store.open_corpus(paths, cancel=cancel)
+        workspace.pin(store_dir)
+
+        for kind in kinds:
+            if cancel is not None and cancel.is_set():
+                raise IngestCancelled()
+            if kind == 'flashcards':
+                artifact_id, created = build_flashcards(retriever, generators[kind],
+                                                        max_concurrency=llm_concurrency)
+            elif kind == 'quiz':
+                artifact_id, created = build_quiz(retriever, generators[kind], whole_corpus, llm_concurrency)
+            else:
+                artifact_id, created = build_lesson_plan(retriever, generators[kind], whole_corpus, llm_concurrency)
+            summary['artifacts'][kind] = artifact_id
+            if created:
+                summary['status'] = 'built'
+    except IngestCancelled:
+        summary['status'] = 'cancelled'
+    except Exception as e:
+        logger.error(f"Corpus {store_dir.name} failed: {str(e)}")
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", type=Path, help="directory tree of PDFs")
+    parser.add_argument("--group", choices=("dir", "tree"), default="dir",
+                        help="one corpus per directory of PDFs, or one for the whole tree")
+    parser.add_argument("--workers", type=int, default=2, help="corpora built at the same time")
+    parser.add_argument("--pdf-workers", type=int, default=PDF_WORKERS, help="processes parsing PDFs per corpus")
+    parser.add_argument("--llm-concurrency", type=int, default=FLASHCARD_CONCURRENCY,
+                        help="concurrent LLM requests per artifact")
+    parser.add_argument("--artifacts", default=",".join(ARTIFACTS),
+                        help=f"comma-separated subset of {','.join(ARTIFACTS)}, or '' for indexes only")
+    parser.add_argument("--whole-corpus", action="store_true", help="build quizzes and plans from every chunk")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", ""),
+                        help="OpenAI API key (default: $OPENAI_API_KEY)")
+    parser.add_argument("--json", action="store_true", help="print one JSON summary per corpus")
+    args = parser.parse_args()
+
+    kinds = [kind for kind in args.artifacts.split(",") if kind]
+    unknown = set(kinds) - set(ARTIFACTS)
+    if unknown:
+        parser.error(f"Unknown artifacts: {', '.join(sorted(unknown))}")
+    if not args.api_key:
+        parser.error("An OpenAI API key is required (--api-key or OPENAI_API_KEY)")
+    if not args.root.is_dir():
+        parser.error(f"Not a directory: {args.root}")
+
+    corpora = find_corpora(args.root, args.group)
+    if not corpora:
+        print(f"No PDFs found under {args.root}", file=sys.stderr)
+        return 0
+
+    vector_store = VectorStore(args.api_key, http_client=resources.get_http_client(), pdf_workers=args.pdf_workers)
+    generators = {
+        'flashcards': resources.get_flashcard_generator(args.api_key, args.model),
+        'quiz': resources.get_quiz_generator(args.api_key, args.model),
+        'lesson_plan': resources.get_lesson_plan_generator(args.api_key, args.model),
+    }
+    cancel = threading.Event()
+    summaries = []
+    executor = ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix='corpus')
+    try:
+        futures = [executor.submit(build_corpus, paths, vector_store, generators, kinds,
+                                   args.whole_corpus, args.llm_concurrency, cancel) for paths in corpora]
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries.append(summary)
+            if args.json:
+                print(json.dumps(summary), flush=True)
+            else:
+                print(f"{summary['status']:<10} {summary['corpus']} {summary['files']:>4} files "
+                      f"{summary['seconds']:>8.1f}s  {summary['directory']}", flush=True)
+    except KeyboardInterrupt:
+        print("Interrupted; stopping in-flight corpora. Rerun to resume.", file=sys.stderr)
+        cancel.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        return 130
+    executor.shutdown()
+    return 1 if any(summary['status'] == 'failed' for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
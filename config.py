@@ -5,10 +5,15 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent
 TMP_DIR = BASE_DIR.joinpath('data', 'tmp')
 LOCAL_VECTOR_STORE_DIR = BASE_DIR.joinpath('data', 'vector_store')
+CACHE_DIR = BASE_DIR.joinpath('data', 'cache')
+
+# One index directory per distinct corpus (see workspace.py)
+CORPUS_STORE_DIR = LOCAL_VECTOR_STORE_DIR.joinpath('corpora')
 
 # Create directories
 TMP_DIR.mkdir(parents=True, exist_ok=True)
 LOCAL_VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Configure matplotlib
 os.environ['MPLCONFIGDIR'] = '/tmp/matplotlib'
@@ -17,4 +22,176 @@ os.environ['MPLCONFIGDIR'] = '/tmp/matplotlib'
 DEFAULT_MODEL = "gpt-3.5-turbo"
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 0
+# 'token' (sentence-aware, CHUNK_TOKENS per chunk) or 'character' (CHUNK_SIZE characters)
+TEXT_SPLITTER = 'token'
+CHUNK_TOKENS = 256
+# Close a token chunk early at a paragraph break once it is this full
+PARAGRAPH_BREAK_FILL = 0.75
 RETRIEVER_K = 7
+
+# Context packing for lesson plans and quizzes
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+COMPLETION_RESERVE_TOKENS = 1024
+CONTEXT_MAX_TOKENS = 3000
+MINHASH_PERMUTATIONS = 64
+SHINGLE_SIZE = 5
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Map-reduce generation over the whole corpus
+MAP_REDUCE_CONCURRENCY = 8
+MAP_GROUP_TOKENS = 2000
+MAP_OUTPUT_TOKENS = 300
+# Estimated total tokens (input + output) the map step may spend
+MAP_REDUCE_TOKEN_BUDGET = 200_000
+REDUCE_MAX_LEVELS = 4
+# Abort instead of generating from partial notes when more than this
+# fraction of map or reduce calls fail
+MAP_REDUCE_MAX_FAILED_FRACTION = 0.25
+
+# Vector store
+# 'chroma' or 'numpy' (memory-mapped, in-process index)
+LOCAL_VECTOR_STORE_BACKEND = 'chroma'
+
+# Hybrid BM25 + dense retrieval
+HYBRID_RETRIEVAL = True
+BM25_K1 = 1.5
+BM25_B = 0.75
+HYBRID_RRF_K = 60
+# Answer from the lexical index alone (no query embedding) when its top
+# BM25 score is at least this high and beats the runner-up by this factor
+LEXICAL_FAST_PATH_MIN_SCORE = 8.0
+LEXICAL_FAST_PATH_MARGIN = 1.5
+
+# Semantic answer cache for chat: reuse an answer when a new question's
+# embedding is at least this cosine-similar to a cached one
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 2048
+
+# Shared HTTP connection pool for OpenAI clients
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+HTTP_KEEPALIVE_EXPIRY = 60.0
+HTTP_TIMEOUT = 60.0
+MAX_CACHED_CHAINS = 32
+
+# Flashcard generation
+FLASHCARD_CONCURRENCY = 5
+FLASHCARD_RETRIES = 2
+FLASHCARD_RETRY_BACKOFF = 1.0
+# Chunks packed into one JSON-mode flashcard request; 1 keeps one card per call
+FLASHCARD_BATCH_SIZE = 5
+# Cards in a generated deck
+FLASHCARD_DECK_SIZE = 5
+# How flashcard source chunks are picked from the stored embeddings: 'mmr' or 'kmeans'
+FLASHCARD_SELECTION = 'mmr'
+MMR_LAMBDA = 0.5
+KMEANS_ITERATIONS = 20
+MIN_SELECTION_CHARS = 50
+
+# PDF extraction
+PDF_WORKERS = os.cpu_count() or 1
+PDF_PAGES_PER_TASK = 32
+
+# Streaming ingestion
+UPLOAD_COPY_BUFFER = 1024 * 1024
+INGEST_QUEUE_SIZE = 64
+EMBED_BATCH_SIZE = 64
+
+# Embedding cache
+EMBEDDING_CACHE_PATH = CACHE_DIR.joinpath('embeddings.sqlite3')
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000
+
+# LLM response cache
+LLM_CACHE_PATH = CACHE_DIR.joinpath('llm_responses.sqlite3')
+LLM_CACHE_MAX_ENTRIES = 50_000
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Both caches write last-used times in batches rather than on every hit, and
+# trim a full cache this fraction below its cap so rows are rarely recounted
+CACHE_TOUCH_BATCH = 256
+CACHE_TOUCH_FLUSH_SECONDS = 30
+CACHE_EVICT_SLACK = 0.1
+
+# Generated decks, quizzes and lesson plans, shared by every session on the same corpus
+ARTIFACT_DB_PATH = BASE_DIR.joinpath('data', 'artifacts.sqlite3')
+ARTIFACT_PAGE_SIZE = 20
+
+# Session upload dirs and corpus indexes unused for this long are deleted
+WORKSPACE_IDLE_SECONDS = 24 * 3600
+WORKSPACE_GC_INTERVAL = 600
+
+# Background ingestion jobs
+JOBS_DB_PATH = BASE_DIR.joinpath('data', 'jobs.sqlite3')
+INGEST_JOB_WORKERS = 2
+# Minimum seconds between progress writes to the job table, and between UI polls
+JOB_PROGRESS_INTERVAL = 0.5
+JOB_POLL_SECONDS = 1.0
+
+# Per-stage metrics: JSON-lines log, Prometheus textfile and latency histogram buckets (seconds)
+METRICS_LOG_PATH = BASE_DIR.joinpath('data', 'metrics.jsonl')
+# Each process writes its own metrics.<pid>.prom next to this path
+METRICS_PROMETHEUS_PATH = BASE_DIR.joinpath('data', 'metrics.prom')
+# Records are buffered and written (with the .prom file) every few seconds, or
+# sooner once this many lines are pending; the log rotates to .1 past the size cap
+METRICS_FLUSH_SECONDS = 5.0
+METRICS_LOG_BUFFER_LINES = 500
+METRICS_LOG_MAX_BYTES = 50 * 1024 * 1024
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Stage records kept for the sidebar timing panel of each session
+METRICS_SESSION_RECORDS = 50
+
+# Spaced-repetition review state (SM-2)
+REVIEW_DB_PATH = BASE_DIR.joinpath('data', 'reviews.sqlite3')
+REVIEW_INITIAL_EASE = 2.5
+REVIEW_MIN_EASE = 1.3
+# A failed card comes back this soon within the same session
+REVIEW_RELEARN_SECONDS = 600
+
+# Startup import-time budgets (milliseconds, cumulative per module),
+# checked by benchmarks/import_budget.py
+IMPORT_TIME_BUDGET_MS = {
+    'config': 50,
+    'plugins': 50,
+    'resources': 300,
+    'vector_store': 1500,
+    'document_processor': 1500,
+    'chat_engine': 3000,
+    # Imported by main.py on every start; PDF parsing and the vector store
+    # stack must stay behind them
+    'jobs': 300,
+    'main': 1200,
+    # Loaded by the app's handlers on first use
+    'study_artifacts': 1500,
+}
+
+# Offline app benchmark budgets (milliseconds), checked by benchmarks/bench_app.py
+# against its default zero-latency fakes
+BENCHMARK_BUDGET_MS = {
+    'ingest.ms_per_chunk': 100,
+    'retrieval.1000.p95_ms': 50,
+    'retrieval.10000.p95_ms': 250,
+    'chat.invoke.p95_ms': 100,
+    'chat.time_to_first_token.p95_ms': 100,
+    'chat.semantic_cache_hit.p95_ms': 20,
+    'generation.flashcards.seconds': 1000,
+    'generation.quiz.seconds': 500,
+    'generation.lesson_plan.seconds': 500,
+}
+
+# HTTP API (server.py)
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8080
+# Threads running blocking work (retrieval, LLM calls, generation) for the event loop
+SERVER_WORKERS = 16
+# Requests allowed to wait for a worker before new ones get 503; coalesced duplicates don't count
+SERVER_MAX_PENDING = 256
+SERVER_REQUEST_TIMEOUT = 300
+SERVER_MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+# Corpus retrievers kept open between requests
+SERVER_MAX_OPEN_CORPORA = 16
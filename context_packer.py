@@ -0,0 +1,112 @@
+import re
+import threading
+import zlib
+from typing import List, Optional, Sequence
+import numpy as np
+import tiktoken
+from config import (
+    DEFAULT_MODEL, MODEL_CONTEXT_TOKENS, COMPLETION_RESERVE_TOKENS, CONTEXT_MAX_TOKENS,
+    MINHASH_PERMUTATIONS, SHINGLE_SIZE, NEAR_DUPLICATE_THRESHOLD
+)
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+_WORD = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def get_encoding(model: str = DEFAULT_MODEL):
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    return len(get_encoding(model).encode_ordinary(text))
+
+
+def prompt_budget(prompt, model: str = DEFAULT_MODEL, **variables) -> int:
+    """Tokens available for ``{content}`` in ``prompt``.
+
+    That is the model's context window minus the rest of the rendered prompt
+    and the completion reserve, capped at CONTEXT_MAX_TOKENS.
+    """
+    messages = prompt.format_messages(content="", **variables)
+    overhead = sum(count_tokens(message.content, model) for message in messages)
+    window = MODEL_CONTEXT_TOKENS.get(model, min(MODEL_CONTEXT_TOKENS.values()))
+    return max(0, min(CONTEXT_MAX_TOKENS, window - COMPLETION_RESERVE_TOKENS - overhead))
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, vectorised with NumPy."""
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 32, size=permutations, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=permutations, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # (a * x + b) mod p for every (permutation, shingle) pair; a, b and the
+        # crc32 values are all below 2**32, so nothing overflows uint64
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % np.uint64(_MERSENNE_PRIME)
+        return permuted.min(axis=1)
+
+
+def drop_near_duplicates(texts: Sequence[str], threshold: float = NEAR_DUPLICATE_THRESHOLD,
+                         hasher: Optional[MinHasher] = None) -> List[int]:
+    """Return indices of ``texts`` to keep, dropping any whose estimated Jaccard
+    similarity to an earlier kept text is at least ``threshold``."""
+    hasher = hasher or MinHasher()
+    kept, signatures = [], []
+    for i, text in enumerate(texts):
+        if not text.strip():
+            continue
+        signature = hasher.signature(text)
+        if signatures and (np.vstack(signatures) == signature).mean(axis=1).max() >= threshold:
+            continue
+        kept.append(i)
+        signatures.append(signature)
+    return kept
+
+
+def pack_context(documents, budget: int, model: str = DEFAULT_MODEL, scores: Optional[Sequence[float]] = None,
+                 separator: str = "\n") -> str:
+    """Join the most relevant, non-redundant chunks into at most ``budget`` tokens.
+
+    ``documents`` are taken in relevance order (highest ``scores`` first when
+    given, otherwise as retrieved). Near-duplicates are dropped, whole chunks
+    are added while they fit, and the first chunk that doesn't fit is cut at
+    the token boundary so the budget is filled exactly.
+    """
+    order = list(range(len(documents)))
+    if scores is not None:
+        order.sort(key=lambda i: scores[i], reverse=True)
+    texts = [documents[i].page_content for i in order]
+    kept = [texts[i] for i in drop_near_duplicates(texts)]
+
+    encoding = get_encoding(model)
+    separator_tokens = len(encoding.encode_ordinary(separator))
+    parts, used = [], 0
+    for text in kept:
+        cost = separator_tokens if parts else 0
+        tokens = encoding.encode_ordinary(text)
+        if used + cost + len(tokens) <= budget:
+            parts.append(text)
+            used += cost + len(tokens)
+            continue
+        remaining = budget - used - cost
+        if remaining > 0:
+            parts.append(encoding.decode(tokens[:remaining]))
+        break
+    return separator.join(parts)
@@ -1,34 +1,170 @@
-import tempfile
+import multiprocessing
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
 from pathlib import Path
-from langchain_community.document_loaders import DirectoryLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import CharacterTextSplitter
-from config import TMP_DIR, CHUNK_SIZE, CHUNK_OVERLAP
+from pypdf import PdfReader
+from token_splitter import OffsetTokenSplitter
+from metrics import stage
+from config import (
+    TMP_DIR, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENS, PARAGRAPH_BREAK_FILL, TEXT_SPLITTER,
+    PDF_WORKERS, PDF_PAGES_PER_TASK, UPLOAD_COPY_BUFFER
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool for PDF extraction, shared by all ingestions with the same worker count.
+
+    Workers come from a fork server (spawn where that is unavailable):
+    forking the multi-threaded app process directly can deadlock on locks
+    held by its other threads. As with any non-fork start method, entry
+    scripts need an ``if __name__ == '__main__'`` guard.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pools[workers] = pool
+        return pool
+
+
+def _discard_pool(workers: int, pool: ProcessPoolExecutor):
+    # A crashed worker breaks the whole pool; the next ingestion starts a fresh one
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_pages(task):
+    """Extract the text of pages [start, end) of one PDF (runs in a worker process)."""
+    path, start, end = task
+    # Given a path, pypdf reads the whole file into memory; a handle is read lazily
+    with open(path, 'rb') as f:
+        reader = PdfReader(f)
+        return path, [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _page_tasks(paths, pages_per_task: int):
+    """Yield (path, start, end) page ranges, counting each file's pages only when it is reached."""
+    for path in paths:
+        path = Path(path).as_posix()
+        with open(path, 'rb') as f:
+            page_count = len(PdfReader(f).pages)
+        for start in range(0, page_count, pages_per_task):
+            yield path, start, min(start + pages_per_task, page_count)
+
 
 class DocumentProcessor:
     @staticmethod
     def load_documents():
+        from langchain_community.document_loaders import DirectoryLoader
         loader = DirectoryLoader(TMP_DIR.as_posix(), glob='**/*.pdf')
         return loader.load()
 
+    @staticmethod
+    def load_documents_parallel(paths=None, workers=PDF_WORKERS, pages_per_task=PDF_PAGES_PER_TASK):
+        """Yield one Document per PDF page, parsing files and page ranges in a process pool.
+
+        Documents come out in a stable order (by path, then page) regardless of
+        which worker finishes first. At most ``2 * workers`` page ranges are in
+        flight, so a slow consumer does not make extracted text pile up, and
+        PDFs are opened as file handles so no process holds a whole file in
+        memory.
+        """
+        if paths is None:
+            paths = sorted(TMP_DIR.glob('**/*.pdf'))
+        remaining = _page_tasks(paths, pages_per_task)
+
+        if workers <= 1:
+            results = map(_extract_pages, remaining)
+            yield from DocumentProcessor._to_documents(results)
+            return
+
+        executor = _process_pool(workers)
+        pending = deque()
+        try:
+            pending.extend(executor.submit(_extract_pages, task) for task in islice(remaining, 2 * workers))
+            while pending:
+                result = pending.popleft().result()
+                for task in islice(remaining, 1):
+                    pending.append(executor.submit(_extract_pages, task))
+                yield from DocumentProcessor._to_documents([result])
+        except BrokenProcessPool:
+            _discard_pool(workers, executor)
+            raise
+        finally:
+            # The pool outlives this call, so drop work nobody will collect
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    def _to_documents(results):
+        for path, pages in results:
+            for page, text in pages:
+                yield Document(page_content=text, metadata={'source': path, 'page': page})
+
     @staticmethod
     def split_documents(documents):
+        if TEXT_SPLITTER == 'token':
+            return OffsetTokenSplitter().split_documents(documents)
         text_splitter = CharacterTextSplitter(
-            chunk_size=CHUNK_SIZE, 
+            chunk_size=CHUNK_SIZE,
             chunk_overlap=CHUNK_OVERLAP
         )
         return text_splitter.split_documents(documents)
 
     @staticmethod
-    def save_uploaded_files(files):
-        for file in files:
-            with tempfile.NamedTemporaryFile(
-                delete=False, 
-                dir=TMP_DIR.as_posix(), 
-                suffix='.pdf'
-            ) as tmp_file:
-                tmp_file.write(file.read())
+    def split_settings():
+        """Settings that determine chunk boundaries; stored chunks are rebuilt when they change."""
+        if TEXT_SPLITTER == 'token':
+            return {'splitter': 'token', 'chunk_tokens': CHUNK_TOKENS, 'paragraph_fill': PARAGRAPH_BREAK_FILL}
+        return {'splitter': 'character', 'chunk_size': CHUNK_SIZE, 'chunk_overlap': CHUNK_OVERLAP}
+
+    @staticmethod
+    def upload_name(name: str, taken: set) -> str:
+        """``name`` without directories, suffixed ' (2)', ' (3)', ... if already in ``taken``; adds it to ``taken``"""
+        name = Path(name).name
+        stem, suffix = Path(name).stem, Path(name).suffix
+        candidate, n = name, 1
+        while candidate in taken:
+            n += 1
+            candidate = f"{stem} ({n}){suffix}"
+        taken.add(candidate)
+        return candidate
+
+    @staticmethod
+    def save_uploaded_files(files, directory=TMP_DIR):
+        # Keep the original file names so the ingest manifest can track each source;
+        # the manifest is keyed by name, so same-named uploads get distinct names
+        paths = []
+        taken = set()
+        with stage('save_uploads') as record:
+            for file in files:
+                path = Path(directory).joinpath(DocumentProcessor.upload_name(file.name, taken))
+                with open(path, 'wb') as tmp_file:
+                    shutil.copyfileobj(file, tmp_file, UPLOAD_COPY_BUFFER)
+                    record.bytes += tmp_file.tell()
+                paths.append(path)
+            record.items = len(paths)
+        return paths
 
     @staticmethod
-    def cleanup_temp_files():
-        for file in TMP_DIR.iterdir():
-            file.unlink()
+    def cleanup_temp_files(directory=TMP_DIR):
+        """Remove uploads; pass a session's own directory so other sessions' files survive"""
+        directory = Path(directory)
+        if directory == TMP_DIR:
+            for file in directory.iterdir():
+                if file.is_file():
+                    file.unlink()
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
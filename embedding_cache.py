@@ -0,0 +1,151 @@
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List
+from langchain_core.embeddings import Embeddings
+from config import (
+    EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES, CACHE_TOUCH_BATCH, CACHE_TOUCH_FLUSH_SECONDS, CACHE_EVICT_SLACK
+)
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+_SQL_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed, on-disk cache in front of an embeddings model.
+
+    Vectors are keyed by a hash of (model name, text), so the same chunk is
+    only ever embedded once per model, across sessions and processes.
+    Last-used times of hits are buffered and written in batches, and the row
+    count is tracked in memory and only recounted once it passes the cap.
+    """
+
+    def __init__(self, embeddings: Embeddings, path=EMBEDDING_CACHE_PATH,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.model_name = getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self._touched = {}
+        self._flushed = time.monotonic()
+        atexit.register(self.flush)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> dict:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            self._touched.update(dict.fromkeys(found, now))
+            if len(self._touched) >= CACHE_TOUCH_BATCH or time.monotonic() - self._flushed >= CACHE_TOUCH_FLUSH_SECONDS:
+                self._flush_touched()
+                self._conn.commit()
+        return found
+
+    def flush(self):
+        """Write buffered last-used times."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(when, key) for key, when in self._touched.items()]
+            )
+            self._touched = {}
+        self._flushed = time.monotonic()
+
+    def _store(self, items: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+            )
+            self._rows += len(items)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # The in-memory count misses other processes' writes, so recount before trimming
+        if self._rows <= self.max_entries:
+            return
+        (self._rows,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if self._rows > self.max_entries:
+            self._flush_touched()
+            excess = self._rows - int(self.max_entries * (1 - CACHE_EVICT_SLACK))
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            self._rows -= excess
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = self._lookup(list(set(keys)))
+
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def log_stats(self):
+        logger.info("Embedding cache (%s): %s", self.model_name, self.stats())
@@ -1,11 +1,63 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from langchain_openai import ChatOpenAI
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from models import Flashcard
+from llm_cache import invoke_cached
+from metrics import propagate
+from config import (
+    DEFAULT_MODEL, FLASHCARD_CONCURRENCY, FLASHCARD_RETRIES, FLASHCARD_RETRY_BACKOFF, FLASHCARD_BATCH_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_TEMPLATE = """Generate one study flashcard for each numbered content chunk below.
+Create a clear concept-explanation pair that helps understand the key idea of each chunk.
+
+{chunks}
+
+Respond with a JSON object of the form
+{{"flashcards": [{{"chunk": <chunk number>, "input_expression": "<the main concept or question>", "output_expression": "<the explanation or answer>", "example_usage": "<an example that illustrates the concept>", "source": "<reference to source material>"}}]}}
+with exactly one flashcard per chunk.
+"""
+
+REQUIRED_FIELDS = ("input_expression", "output_expression", "example_usage")
+
+
+def parse_flashcard_batch(text: str, count: int) -> List[Optional[Flashcard]]:
+    """Map a JSON-mode batch response to one flashcard (or None) per chunk.
+
+    Each item is validated on its own, so a missing or malformed card only
+    leaves its own slot empty. Raises ValueError when nothing usable came
+    back, which keeps the response out of the cache.
+    """
+    items = json.loads(text).get("flashcards")
+    if not isinstance(items, list):
+        raise ValueError("Response has no 'flashcards' list")
+    cards: List[Optional[Flashcard]] = [None] * count
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        chunk = item.get("chunk")
+        if not isinstance(chunk, int) or not 1 <= chunk <= count or cards[chunk - 1] is not None:
+            continue
+        if not all(isinstance(item.get(field), str) and item[field].strip() for field in REQUIRED_FIELDS):
+            continue
+        cards[chunk - 1] = Flashcard.from_dict({**item, "source": str(item.get("source") or "")})
+    if not any(cards):
+        raise ValueError(f"No valid flashcards in batch of {count}")
+    return cards
+
 
 class FlashcardGeneratorOpenAI:
-    def __init__(self, api_key: str, llm_model: str = "gpt-3.5-turbo"):
-        self.chat = ChatOpenAI(temperature=0.0, model=llm_model, api_key=api_key)
+    def __init__(self, api_key: str, llm_model: str = DEFAULT_MODEL, http_client=None, chat_model=None):
+        self.chat = chat_model or ChatOpenAI(
+            temperature=0.0, model=llm_model, api_key=api_key, http_client=http_client
+        )
         
         response_schemas = [
             ResponseSchema(name="input_expression", description="The main concept or question"),
@@ -26,12 +78,76 @@ class FlashcardGeneratorOpenAI:
         
         self.prompt = ChatPromptTemplate.from_template(template)
 
+        # Batches use JSON mode so the reply is always a parseable object
+        self.json_chat = chat_model or ChatOpenAI(
+            temperature=0.0, model=llm_model, api_key=api_key, http_client=http_client,
+            model_kwargs={"response_format": {"type": "json_object"}}
+        )
+        self.batch_prompt = ChatPromptTemplate.from_template(BATCH_TEMPLATE)
 
     def generate_flashcard(self, content: str) -> Flashcard:
         messages = self.prompt.format_messages(
             content=content,
             format_instructions=self.format_instructions
         )
-        response = self.chat.invoke(messages)
-        flashcard_dict = self.output_parser.parse(response.content)
+        flashcard_dict = invoke_cached(
+            self.chat, messages, self.output_parser.parse, schema=self.format_instructions
+        )
         return Flashcard(**flashcard_dict)
+
+    def generate_flashcard_batch(self, contents: List[str]) -> List[Optional[Flashcard]]:
+        """Generate flashcards for several chunks in one JSON-mode call, one result per chunk."""
+        chunks = "\n\n".join(f"Chunk {i}:\n{content}" for i, content in enumerate(contents, start=1))
+        messages = self.batch_prompt.format_messages(chunks=chunks)
+        return invoke_cached(
+            self.json_chat, messages, lambda text: parse_flashcard_batch(text, len(contents)), schema=BATCH_TEMPLATE
+        )
+
+    def generate_flashcards(self, contents: List[str], max_concurrency: int = FLASHCARD_CONCURRENCY,
+                            retries: int = FLASHCARD_RETRIES,
+                            batch_size: int = FLASHCARD_BATCH_SIZE) -> List[Optional[Flashcard]]:
+        """Generate one flashcard per content, running requests concurrently.
+
+        With ``batch_size`` above 1, contents are packed ``batch_size`` to a
+        request. Results are in input order; an item that still fails after
+        ``retries`` retries is returned as None without affecting the others.
+        """
+        if not contents:
+            return []
+        if batch_size <= 1:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(contents)))) as executor:
+                generate = propagate(lambda content: self._generate_with_retry(content, retries))
+                return list(executor.map(generate, contents))
+
+        batches = [contents[i:i + batch_size] for i in range(0, len(contents), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as executor:
+            results = executor.map(propagate(lambda batch: self._generate_batch_with_retry(batch, retries)), batches)
+            return [card for batch_cards in results for card in batch_cards]
+
+    def _generate_batch_with_retry(self, contents: List[str], retries: int) -> List[Optional[Flashcard]]:
+        # Only the chunks still missing a card are sent again
+        cards: List[Optional[Flashcard]] = [None] * len(contents)
+        pending = list(range(len(contents)))
+        for attempt in range(retries + 1):
+            try:
+                batch_cards = self.generate_flashcard_batch([contents[i] for i in pending])
+                for i, card in zip(pending, batch_cards):
+                    cards[i] = card
+            except Exception as e:
+                logger.warning(f"Flashcard batch failed (attempt {attempt + 1}/{retries + 1}): {str(e)}")
+            pending = [i for i in pending if cards[i] is None]
+            if not pending:
+                break
+            if attempt < retries:
+                time.sleep(FLASHCARD_RETRY_BACKOFF * 2 ** attempt)
+        return cards
+
+    def _generate_with_retry(self, content: str, retries: int) -> Optional[Flashcard]:
+        for attempt in range(retries + 1):
+            try:
+                return self.generate_flashcard(content)
+            except Exception as e:
+                logger.warning(f"Flashcard generation failed (attempt {attempt + 1}/{retries + 1}): {str(e)}")
+                if attempt < retries:
+                    time.sleep(FLASHCARD_RETRY_BACKOFF * 2 ** attempt)
+        return None
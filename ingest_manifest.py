@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+from config import LOCAL_VECTOR_STORE_DIR
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def file_hash(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """Tracks which source files are in the vector store and the chunk IDs each produced.
+
+    Entries are keyed by source file name and hold the file's content hash, so
+    re-ingestion only has to touch files that were added, changed or removed.
+    """
+
+    def __init__(self, store_dir: Path = LOCAL_VECTOR_STORE_DIR):
+        self.path = Path(store_dir).joinpath(MANIFEST_NAME)
+        self.files: Dict[str, dict] = {}
+        # Splitter settings the stored chunks were built with
+        self.settings = None
+        if self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            self.files = data.get('files', {})
+            self.settings = data.get('settings')
+
+    def diff(self, paths: List[Path], force: bool = False) -> Tuple[Dict[Path, str], List[str]]:
+        """Return ({path: hash} for new or changed files, [names of removed files]).
+
+        With ``force`` every path is reported as changed.
+        """
+        changed = {}
+        current = set()
+        for path in paths:
+            path = Path(path)
+            current.add(path.name)
+            digest = file_hash(path)
+            entry = self.files.get(path.name)
+            if force or entry is None or entry['hash'] != digest:
+                changed[path] = digest
+        removed = [name for name in self.files if name not in current]
+        return changed, removed
+
+    def chunk_ids(self, name: str) -> List[str]:
+        entry = self.files.get(name)
+        return list(entry['chunk_ids']) if entry else []
+
+    @staticmethod
+    def chunk_id_prefix(name: str, digest: str) -> str:
+        return hashlib.sha256(f"{name}\x00{digest}".encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def make_chunk_ids(name: str, digest: str, count: int) -> List[str]:
+        prefix = IngestManifest.chunk_id_prefix(name, digest)
+        return [f"{prefix}-{i}" for i in range(count)]
+
+    def record(self, name: str, digest: str, chunk_ids: List[str]):
+        self.files[name] = {'hash': digest, 'chunk_ids': list(chunk_ids)}
+
+    def forget(self, name: str):
+        self.files.pop(name, None)
+
+    @property
+    def version(self) -> str:
+        """Hash identifying the exact set of file contents currently in the store."""
+        entries = sorted((name, entry['hash']) for name, entry in self.files.items())
+        return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.files, 'settings': self.settings}, f)
+        os.replace(tmp_path, self.path)
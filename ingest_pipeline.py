@@ -0,0 +1,175 @@
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, List
+from document_processor import DocumentProcessor
+from ingest_manifest import IngestManifest
+from metrics import StageRecord, get_metrics, propagate
+from config import INGEST_QUEUE_SIZE, EMBED_BATCH_SIZE, PDF_WORKERS
+
+_DONE = object()
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+class _StageError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class IngestPipeline:
+    """Streams PDFs through extract -> split -> embed/write with bounded queues.
+
+    Each stage runs in its own thread and hands items to the next through a
+    queue of at most ``queue_size`` entries, so memory stays flat regardless
+    of corpus size and later pages are parsed while earlier chunks embed.
+    Stage metrics count only time spent working, not time blocked on a queue.
+    """
+
+    def __init__(self, vectordb, queue_size: int = INGEST_QUEUE_SIZE,
+                 batch_size: int = EMBED_BATCH_SIZE, sinks=(), progress=None, cancel: threading.Event = None,
+                 pdf_workers: int = PDF_WORKERS):
+        self.vectordb = vectordb
+        self.pdf_workers = pdf_workers
+        # progress(stage, count) is called as pages are extracted and chunks written;
+        # setting ``cancel`` stops the run with IngestCancelled at the next batch
+        self.progress = progress
+        self.cancel = cancel
+        # Extra indexes (e.g. the BM25 index) fed the same chunk batches
+        self.sinks = list(sinks)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+
+    def run(self, files: Dict[Path, str]) -> Dict[Path, List[str]]:
+        """Index ``{path: content hash}`` and return the chunk IDs written for each path."""
+        by_source = {Path(path).as_posix(): Path(path) for path in files}
+        chunk_ids = {path: [] for path in files}
+        pages = queue.Queue(maxsize=self.queue_size)
+        chunks = queue.Queue(maxsize=self.queue_size)
+
+        threads = [
+            threading.Thread(target=propagate(self._extract), args=(list(files), pages), daemon=True),
+            threading.Thread(target=propagate(self._split), args=(files, by_source, pages, chunks), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        record = StageRecord('embed_write')
+        embeddings = getattr(self.vectordb, 'embeddings', None)
+        hits, misses = getattr(embeddings, 'hits', 0), getattr(embeddings, 'misses', 0)
+        try:
+            batch, batch_ids = [], []
+            for path, chunk_id, chunk in self._drain(chunks):
+                self._check_cancelled()
+                # Dense stores don't all return IDs with search results, so the ID rides in the metadata too
+                chunk.metadata['chunk_id'] = chunk_id
+                batch.append(chunk)
+                batch_ids.append(chunk_id)
+                chunk_ids[path].append(chunk_id)
+                if len(batch) >= self.batch_size:
+                    self._write(batch, batch_ids, record)
+                    batch, batch_ids = [], []
+            if batch:
+                self._write(batch, batch_ids, record)
+            self._check_cancelled()
+        except BaseException:
+            record.error = True
+            raise
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            # Cache counters are per embeddings instance, so a concurrent sync may blur them
+            record.cache_hits = getattr(embeddings, 'hits', 0) - hits
+            record.cache_misses = getattr(embeddings, 'misses', 0) - misses
+            get_metrics().record(record)
+        return chunk_ids
+
+    def _write(self, batch, batch_ids, record: StageRecord):
+        with record.timer():
+            self.vectordb.add_documents(batch, ids=batch_ids)
+            for sink in self.sinks:
+                sink.add_documents(batch, ids=batch_ids)
+        record.items += len(batch)
+        record.bytes += sum(len(chunk.page_content.encode('utf-8')) for chunk in batch)
+        self._report('embed', record.items)
+
+    def _check_cancelled(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise IngestCancelled()
+
+    def _report(self, stage: str, count: int):
+        if self.progress is not None:
+            self.progress(stage, count)
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drain(self, q: queue.Queue):
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                # The producer stops without a _DONE when the run is aborted
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+
+    def _extract(self, paths, pages: queue.Queue):
+        record = StageRecord('pdf_extract')
+        try:
+            documents = iter(DocumentProcessor.load_documents_parallel(paths, workers=self.pdf_workers))
+            while True:
+                with record.timer():
+                    page = next(documents, _DONE)
+                if page is _DONE:
+                    break
+                record.items += 1
+                record.bytes += len(page.page_content.encode('utf-8'))
+                self._report('extract', record.items)
+                if not self._put(pages, page):
+                    return
+            self._put(pages, _DONE)
+        except BaseException as e:
+            record.error = True
+            self._put(pages, _StageError(e))
+        finally:
+            get_metrics().record(record)
+
+    def _split(self, files, by_source, pages: queue.Queue, chunks: queue.Queue):
+        record = StageRecord('split')
+        try:
+            counters = {path: 0 for path in files}
+            prefixes = {path: IngestManifest.chunk_id_prefix(path.name, digest)
+                        for path, digest in files.items()}
+            for page in self._drain(pages):
+                path = by_source[page.metadata['source']]
+                with record.timer():
+                    page_chunks = DocumentProcessor.split_documents([page])
+                record.items += len(page_chunks)
+                record.bytes += len(page.page_content.encode('utf-8'))
+                for chunk in page_chunks:
+                    chunk_id = f"{prefixes[path]}-{counters[path]}"
+                    counters[path] += 1
+                    if not self._put(chunks, (path, chunk_id, chunk)):
+                        return
+            self._put(chunks, _DONE)
+        except BaseException as e:
+            record.error = True
+            self._put(chunks, _StageError(e))
+        finally:
+            get_metrics().record(record)
@@ -0,0 +1,211 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+import workspace
+from metrics import propagate
+from config import JOBS_DB_PATH, INGEST_JOB_WORKERS, JOB_PROGRESS_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_runner = None
+_runner_lock = threading.Lock()
+
+ACTIVE = ('queued', 'running')
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    status: str
+    stage: str
+    pages: int
+    chunks: int
+    error: Optional[str]
+    result: Optional[str]
+    created: float
+    updated: float
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+
+class JobRunner:
+    """Runs ingestion jobs on a worker pool and tracks them in a SQLite job table.
+
+    A job is ``fn(progress, cancel)``: it reports with ``progress(stage, count)``,
+    should stop when the ``cancel`` event is set, and returns a result string.
+    Submitting a key that already has a queued or running job returns that job
+    instead of starting another. Jobs left active by a process that has since
+    exited are marked failed on startup.
+    """
+
+    def __init__(self, path=JOBS_DB_PATH, workers: int = INGEST_JOB_WORKERS):
+        self.path = str(path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cancel = {}
+        self._last_progress = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest-job')
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL DEFAULT '',
+                pages INTEGER NOT NULL DEFAULT 0,
+                chunks INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT,
+                pid INTEGER NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key_status ON jobs(key, status)")
+        conn.commit()
+        self._fail_orphans()
+
+    def _fail_orphans(self):
+        # Jobs only run in the process that accepted them
+        conn = self._connection()
+        rows = conn.execute("SELECT id, pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        orphans = [job_id for job_id, pid in rows if not _process_alive(pid)]
+        for job_id in orphans:
+            self._update(job_id, status='failed', error='Interrupted by a restart')
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id: str, **fields):
+        fields['updated'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connection()
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+
+    def submit(self, key: str, fn: Callable[[Callable, threading.Event], str]) -> Tuple[str, bool]:
+        """Queue ``fn`` under ``key``; returns (job id, whether a new job was created)."""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running') ORDER BY created LIMIT 1",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                return row[0], False
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (id, key, status, pid, created, updated) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, key, os.getpid(), now, now)
+            )
+            conn.commit()
+            self._cancel[job_id] = threading.Event()
+        self._executor.submit(propagate(self._run), job_id, fn)
+        return job_id, True
+
+    def _run(self, job_id: str, fn):
+        cancel = self._cancel[job_id]
+        try:
+            if cancel.is_set():
+                self._update(job_id, status='cancelled')
+                return
+            self._update(job_id, status='running')
+            result = fn(lambda stage, count: self._progress(job_id, stage, count), cancel)
+            counts = {name: value for name, value in self._last_progress.get(job_id, {}).items()
+                      if name in ('pages', 'chunks')}
+            self._update(job_id, status='done', stage='done', result=result, **counts)
+        except Exception as e:
+            # Jobs stop on cancel by raising (e.g. IngestCancelled)
+            if cancel.is_set():
+                self._update(job_id, status='cancelled')
+                return
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, status='failed', error=str(e))
+        finally:
+            with self._lock:
+                self._cancel.pop(job_id, None)
+                self._last_progress.pop(job_id, None)
+
+    def _progress(self, job_id: str, stage: str, count: int):
+        column = {'extract': 'pages', 'embed': 'chunks'}.get(stage)
+        progress = self._last_progress.setdefault(job_id, {'_written': 0.0})
+        if column:
+            progress[column] = count
+        progress['stage'] = stage
+        # Throttle writes; the final counts are written when the job finishes
+        now = time.time()
+        if now - progress['_written'] >= JOB_PROGRESS_INTERVAL:
+            progress['_written'] = now
+            self._update(job_id, **{name: value for name, value in progress.items() if name != '_written'})
+
+    def cancel(self, job_id: str):
+        """Stop a running job at its next check, or drop a queued one before it starts."""
+        with self._lock:
+            event = self._cancel.get(job_id)
+            if event is not None:
+                event.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        jobs = self.jobs([job_id])
+        return jobs[0] if jobs else None
+
+    def jobs(self, job_ids: List[str]) -> List[Job]:
+        """The given jobs, in the order of ``job_ids``."""
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" * len(job_ids))
+        rows = self._connection().execute(
+            f"SELECT id, key, status, stage, pages, chunks, error, result, created, updated "
+            f"FROM jobs WHERE id IN ({placeholders})", list(job_ids)
+        ).fetchall()
+        by_id = {row[0]: Job(*row) for row in rows}
+        return [by_id[job_id] for job_id in job_ids if job_id in by_id]
+
+
+def ingest_job(vector_store, paths, upload_dir):
+    """Job body that builds or reuses the index of ``paths``, then drops the uploads."""
+    def run(progress, cancel):
+        # Imported here to keep this module off the app's startup path
+        from document_processor import DocumentProcessor
+        try:
+            return vector_store.open_corpus(paths, progress=progress, cancel=cancel).metadata['store_dir']
+        finally:
+            DocumentProcessor.cleanup_temp_files(upload_dir)
+            workspace.collect_garbage()
+    return run
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def get_job_runner() -> JobRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -1,10 +1,16 @@
 from langchain_openai import ChatOpenAI
 from langchain.output_parsers import ResponseSchema, StructuredOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from llm_cache import invoke_cached
+from context_packer import prompt_budget
+from config import DEFAULT_MODEL
 
 class LessonPlanGenerator:
-    def __init__(self, api_key: str):
-        self.chat = ChatOpenAI(temperature=0.0, api_key=api_key)
+    def __init__(self, api_key: str, llm_model: str = DEFAULT_MODEL, http_client=None, chat_model=None):
+        self.model = llm_model
+        self.chat = chat_model or ChatOpenAI(
+            temperature=0.0, model=llm_model, api_key=api_key, http_client=http_client
+        )
         response_schemas = [
             ResponseSchema(name="week_plan", description="Daily learning objectives and activities for 7 days"),
             ResponseSchema(name="topics", description="Main topics to be covered"),
@@ -19,18 +25,23 @@ class LessonPlanGenerator:
             """
         )
     
+    def context_budget(self) -> int:
+        return prompt_budget(self.prompt, self.model, format_instructions=self.format_instructions)
+
     def generate_plan(self, content: str) -> dict:
         messages = self.prompt.format_messages(
             content=content,
             format_instructions=self.format_instructions
         )
-        response = self.chat.invoke(messages)
-        return self.output_parser.parse(response.content)
+        return invoke_cached(self.chat, messages, self.output_parser.parse, schema=self.format_instructions)
 
 
 class QuizGenerator:
-    def __init__(self, api_key: str):
-        self.chat = ChatOpenAI(temperature=0.0, api_key=api_key)
+    def __init__(self, api_key: str, llm_model: str = DEFAULT_MODEL, http_client=None, chat_model=None):
+        self.model = llm_model
+        self.chat = chat_model or ChatOpenAI(
+            temperature=0.0, model=llm_model, api_key=api_key, http_client=http_client
+        )
         
         response_schemas = [
             ResponseSchema(name="questions", description="List of quiz questions"),
@@ -48,11 +59,13 @@ class QuizGenerator:
         
         self.prompt = ChatPromptTemplate.from_template(template)
 
+    def context_budget(self) -> int:
+        return prompt_budget(self.prompt, self.model, format_instructions=self.format_instructions)
+
     def generate_quiz(self, content: str) -> dict:
         messages = self.prompt.format_messages(
             content=content,
             format_instructions=self.format_instructions
         )
-        response = self.chat.invoke(messages)
-        return self.output_parser.parse(response.content)
+        return invoke_cached(self.chat, messages, self.output_parser.parse, schema=self.format_instructions)
 
@@ -0,0 +1,267 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from config import (
+    RETRIEVER_K, BM25_K1, BM25_B, HYBRID_RRF_K, LEXICAL_FAST_PATH_MIN_SCORE, LEXICAL_FAST_PATH_MARGIN
+)
+
+INDEX_NAME = 'lexical_index'
+# Inside INDEX_NAME: chunk IDs and vocabulary, postings as flat arrays, and the
+# chunks' texts and metadata as JSON lines addressed by byte offset
+_META = 'meta.json'
+_ARRAYS = ('term_offsets', 'posting_rows', 'posting_tfs', 'lengths', 'doc_offsets')
+_DOCS = 'docs.jsonl'
+
+# Keeps section numbers such as "4.2" together as one term
+_TOKEN = re.compile(r"\w+(?:\.\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 inverted index over the same chunks that go into the vector store.
+
+    Supports incremental ``add_documents`` / ``delete`` with the ingest
+    manifest's chunk IDs and is persisted next to the vector store. A loaded
+    index memory-maps its postings and reads a chunk's text only when that
+    chunk is returned, so opening a corpus costs no parsing; the first edit
+    turns it back into the in-memory form the edits work on.
+    """
+
+    def __init__(self, path: Optional[Path] = None, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.doc_lengths: Dict[str, int] = {}
+        self.docs: Dict[str, Tuple[str, dict]] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+        # Set while the index is backed by the mapped files
+        self._frozen = None
+
+    @classmethod
+    def load(cls, store_dir: Path) -> "BM25Index":
+        index = cls(Path(store_dir).joinpath(INDEX_NAME))
+        if index.path.joinpath(_META).exists():
+            with open(index.path.joinpath(_META)) as f:
+                meta = json.load(f)
+            frozen = {name: np.load(index.path.joinpath(f"{name}.npy"), mmap_mode='r') for name in _ARRAYS}
+            docs_path = index.path.joinpath(_DOCS)
+            frozen.update(
+                ids=meta['ids'],
+                rows={chunk_id: row for row, chunk_id in enumerate(meta['ids'])},
+                terms={term: i for i, term in enumerate(meta['terms'])},
+                docs=np.memmap(docs_path, dtype=np.uint8, mode='r') if docs_path.stat().st_size else None,
+            )
+            index.total_length = meta['total_length']
+            index._frozen = frozen
+        return index
+
+    def save(self):
+        with self._lock:
+            self._thaw()
+            ids = list(self.docs)
+            rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+            terms = sorted(self.postings)
+            term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            posting_rows, posting_tfs = [], []
+            for i, term in enumerate(terms):
+                postings = self.postings[term]
+                posting_rows.extend(rows[chunk_id] for chunk_id in postings)
+                posting_tfs.extend(postings.values())
+                term_offsets[i + 1] = len(posting_rows)
+            lines = [(json.dumps(self.docs[chunk_id]) + "\n").encode('utf-8') for chunk_id in ids]
+            arrays = {
+                'term_offsets': term_offsets,
+                'posting_rows': np.asarray(posting_rows, dtype=np.int32),
+                'posting_tfs': np.asarray(posting_tfs, dtype=np.int32),
+                'lengths': np.asarray([self.doc_lengths[chunk_id] for chunk_id in ids], dtype=np.int32),
+                'doc_offsets': np.concatenate([[0], np.cumsum([len(line) for line in lines], dtype=np.int64)]),
+            }
+            self.path.mkdir(parents=True, exist_ok=True)
+            for name, array in arrays.items():
+                self._replace(f"{name}.npy", lambda f, array=array: np.save(f, array))
+            self._replace(_DOCS, lambda f: f.writelines(lines))
+            # Written last: a loader only trusts the arrays once their meta is in place
+            meta = {'ids': ids, 'terms': terms, 'total_length': self.total_length}
+            self._replace(_META, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+    def _replace(self, name: str, write):
+        tmp_path = self.path.joinpath(f"{name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, self.path.joinpath(name))
+
+    def _thaw(self):
+        """Switch a loaded index to the in-memory form, reading every chunk."""
+        frozen, self._frozen = self._frozen, None
+        if frozen is None:
+            return
+        ids, offsets = frozen['ids'], frozen['term_offsets']
+        for term, i in frozen['terms'].items():
+            start, end = offsets[i], offsets[i + 1]
+            self.postings[term] = {ids[row]: int(tf) for row, tf in
+                                   zip(frozen['posting_rows'][start:end], frozen['posting_tfs'][start:end])}
+        for row, chunk_id in enumerate(ids):
+            self.doc_lengths[chunk_id] = int(frozen['lengths'][row])
+            self.docs[chunk_id] = tuple(self._read_doc(frozen, row))
+
+    @staticmethod
+    def _read_doc(frozen: dict, row: int):
+        start, end = frozen['doc_offsets'][row], frozen['doc_offsets'][row + 1]
+        return json.loads(bytes(frozen['docs'][start:end]))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._frozen['ids']) if self._frozen is not None else len(self.docs)
+
+    def _add(self, chunk_id: str, text: str, metadata: dict):
+        if chunk_id in self.docs:
+            self._remove(chunk_id)
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self.postings[term][chunk_id] = tf
+        length = sum(terms.values())
+        self.doc_lengths[chunk_id] = length
+        self.total_length += length
+        self.docs[chunk_id] = (text, metadata)
+
+    def _remove(self, chunk_id: str):
+        text, _ = self.docs.pop(chunk_id)
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(chunk_id)
+
+    def add_documents(self, documents: List[Document], ids: List[str]):
+        with self._lock:
+            self._thaw()
+            for doc, chunk_id in zip(documents, ids):
+                self._add(chunk_id, doc.page_content, doc.metadata)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._thaw()
+            for chunk_id in ids:
+                if chunk_id in self.docs:
+                    self._remove(chunk_id)
+
+    def search(self, query: str, k: int = RETRIEVER_K) -> List[Tuple[str, float]]:
+        with self._lock:
+            if self._frozen is not None:
+                return self._search_frozen(query, k)
+            n = len(self.docs)
+            if n == 0:
+                return []
+            avg_length = self.total_length / n
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def _search_frozen(self, query: str, k: int) -> List[Tuple[str, float]]:
+        frozen = self._frozen
+        n = len(frozen['ids'])
+        if n == 0:
+            return []
+        avg_length = self.total_length / n
+        offsets, lengths = frozen['term_offsets'], frozen['lengths']
+        scores = np.zeros(n)
+        for term in set(tokenize(query)):
+            i = frozen['terms'].get(term)
+            if i is None:
+                continue
+            start, end = offsets[i], offsets[i + 1]
+            rows = frozen['posting_rows'][start:end]
+            tf = frozen['posting_tfs'][start:end].astype(np.float64)
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[rows] / avg_length)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            # Keep every chunk tied with the k-th score so ties break by chunk order
+            kth = np.partition(scores[matched], len(matched) - k)[len(matched) - k]
+            matched = matched[scores[matched] >= kth]
+        matched = matched[np.argsort(-scores[matched], kind='stable')][:k]
+        return [(frozen['ids'][row], float(scores[row])) for row in matched]
+
+    def document(self, chunk_id: str) -> Document:
+        with self._lock:
+            if self._frozen is not None:
+                text, metadata = self._read_doc(self._frozen, self._frozen['rows'][chunk_id])
+            else:
+                text, metadata = self.docs[chunk_id]
+        return Document(id=chunk_id, page_content=text, metadata=metadata)
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuses BM25 and dense rankings with reciprocal rank fusion.
+
+    When the lexical ranking is confident on its own (a strong top score that
+    clearly beats the runner-up) the dense retriever, and therefore the query
+    embedding call, is skipped entirely.
+    """
+
+    dense: BaseRetriever
+    index: Any
+    vectorstore: Any = None
+    k: int = RETRIEVER_K
+    rrf_k: int = HYBRID_RRF_K
+    fast_path_min_score: float = LEXICAL_FAST_PATH_MIN_SCORE
+    fast_path_margin: float = LEXICAL_FAST_PATH_MARGIN
+
+    def _lexical_is_confident(self, hits: List[Tuple[str, float]]) -> bool:
+        if not hits or hits[0][1] < self.fast_path_min_score:
+            return False
+        return len(hits) == 1 or hits[0][1] >= self.fast_path_margin * hits[1][1]
+
+    def lexical_hits(self, query: str) -> Tuple[List[Tuple[str, float]], bool]:
+        """BM25 top-k for ``query`` and whether it is confident enough to skip dense retrieval."""
+        hits = self.index.search(query, self.k)
+        return hits, self._lexical_is_confident(hits)
+
+    def retrieve(self, query: str, lexical: Optional[Tuple[List[Tuple[str, float]], bool]] = None,
+                 callbacks=None) -> List[Document]:
+        """Hybrid retrieval for ``query``, reusing ``lexical = lexical_hits(query)`` if the caller already ran it."""
+        hits, confident = lexical if lexical is not None else self.lexical_hits(query)
+        if confident:
+            return [self.index.document(chunk_id) for chunk_id, _ in hits]
+
+        dense_docs = self.dense.invoke(query, config={"callbacks": callbacks})
+        fused = defaultdict(float)
+        docs = {}
+        for rank, (chunk_id, _) in enumerate(hits):
+            doc = self.index.document(chunk_id)
+            key = doc.page_content
+            docs.setdefault(key, doc)
+            fused[key] += 1 / (self.rrf_k + rank + 1)
+        for rank, doc in enumerate(dense_docs):
+            key = doc.page_content
+            docs.setdefault(key, doc)
+            fused[key] += 1 / (self.rrf_k + rank + 1)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:self.k]
+        return [docs[key] for key in ranked]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.retrieve(query, callbacks=run_manager.get_child())
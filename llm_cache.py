@@ -0,0 +1,226 @@
+import atexit
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+from metrics import StageRecord, get_metrics, stage
+from config import (
+    LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, CACHE_TOUCH_BATCH, CACHE_TOUCH_FLUSH_SECONDS,
+    CACHE_EVICT_SLACK
+)
+
+
+class ResponseCache:
+    """Disk-backed cache of LLM responses shared by the chat engine and the generators.
+
+    Entries are keyed by (model, rendered prompt, parser schema), expire after
+    ``ttl`` seconds, and are evicted least-recently-used beyond ``max_entries``.
+    SQLite in WAL mode lets several Streamlit worker processes share one file.
+    Last-used times of hits are buffered and written in batches, and the row
+    count is tracked in memory; expired rows are purged and the table
+    recounted only once that count passes the cap.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl: float = LLM_CACHE_TTL_SECONDS):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._flushed = time.monotonic()
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        conn.commit()
+        (self._rows,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(model: str, prompt: str, schema: str = "") -> str:
+        return hashlib.sha256("\x00".join([model, prompt, schema]).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = now
+            due = len(self._touched) >= CACHE_TOUCH_BATCH or time.monotonic() - self._flushed >= CACHE_TOUCH_FLUSH_SECONDS
+        if due:
+            self.flush()
+        return row[0]
+
+    def flush(self):
+        """Write buffered last-used times."""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._flushed = time.monotonic()
+        if touched:
+            conn = self._connection()
+            conn.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                [(when, key) for key, when in touched.items()]
+            )
+            conn.commit()
+
+    def put(self, key: str, response: str):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created, last_used) VALUES (?, ?, ?, ?)",
+            (key, response, now, now)
+        )
+        conn.commit()
+        with self._lock:
+            self._rows += 1
+            full = self._rows > self.max_entries
+        if full:
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        # The in-memory count misses other processes' writes, so recount before trimming
+        self.flush()
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if count > self.max_entries:
+            excess = count - int(self.max_entries * (1 - CACHE_EVICT_SLACK))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            count -= excess
+        conn.commit()
+        with self._lock:
+            self._rows = count
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+        with self._lock:
+            self._touched = {}
+            self._rows = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def set_response_cache(cache: ResponseCache):
+    """Swap the shared cache, e.g. for a scratch file in benchmarks."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def render_messages(messages) -> str:
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+
+def _model_name(chat) -> str:
+    return getattr(chat, 'model_name', None) or type(chat).__name__
+
+
+def _chat_key(cache: ResponseCache, chat, messages, schema: str) -> str:
+    return cache.key(_model_name(chat), render_messages(messages), schema)
+
+
+def _record_usage(record: StageRecord, usage: Optional[dict]):
+    if usage:
+        record.prompt_tokens += usage.get('input_tokens', 0)
+        record.completion_tokens += usage.get('output_tokens', 0)
+
+
+def invoke_cached(chat, messages, parse: Callable[[str], object] = lambda text: text, schema: str = ""):
+    """Invoke ``chat`` through the shared response cache.
+
+    A response is only cached once ``parse`` accepts it, so a malformed
+    answer is retried upstream rather than served again from the cache.
+    """
+    cache = get_response_cache()
+    key = _chat_key(cache, chat, messages, schema)
+    with stage('llm', model=_model_name(chat)) as record:
+        text = cache.get(key)
+        if text is not None:
+            record.cache_hits = 1
+            return parse(text)
+        record.cache_misses = 1
+        response = chat.invoke(messages)
+        _record_usage(record, getattr(response, 'usage_metadata', None))
+        text = response.content
+        result = parse(text)
+    cache.put(key, text)
+    return result
+
+
+def stream_cached(chat, messages, schema: str = ""):
+    """Stream ``chat`` token by token, serving a cached response in one piece."""
+    cache = get_response_cache()
+    key = _chat_key(cache, chat, messages, schema)
+    record = StageRecord('llm', labels={'model': _model_name(chat)})
+    try:
+        with record.timer():
+            text = cache.get(key)
+        if text is not None:
+            record.cache_hits = 1
+            yield text
+            return
+        record.cache_misses = 1
+        tokens = []
+        # Only time spent waiting on the model counts, not the consumer rendering tokens
+        chunks = iter(chat.stream(messages))
+        while True:
+            with record.timer():
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            _record_usage(record, getattr(chunk, 'usage_metadata', None))
+            if chunk.content:
+                tokens.append(chunk.content)
+                yield chunk.content
+        cache.put(key, "".join(tokens))
+    except Exception:
+        record.error = True
+        raise
+    finally:
+        get_metrics().record(record)
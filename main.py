@@ -1,13 +1,16 @@
 import streamlit as st
-import json
-from models import Flashcards
-from document_processor import DocumentProcessor
-from vector_store import VectorStore
-from chat_engine import ChatEngine
-from flashcard_generator import FlashcardGeneratorOpenAI
+from models import Flashcard
+import resources
+import workspace
+from review_scheduler import GRADES, ReviewScheduler
+from artifact_store import get_artifact_store
+from metrics import StageLog, collect_into, get_metrics
+from jobs import get_job_runner, ingest_job
+from config import ARTIFACT_PAGE_SIZE, METRICS_SESSION_RECORDS, JOB_POLL_SECONDS
 import logging
 import time
-from learning_tools import QuizGenerator,LessonPlanGenerator
+import uuid
+from pathlib import Path
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -56,20 +59,34 @@ def add_custom_css():
     """, unsafe_allow_html=True)
 
 # Initialize session state
-if 'flashcards' not in st.session_state:
-    st.session_state.flashcards = Flashcards([])
+if 'flashcards_id' not in st.session_state:
+    st.session_state.flashcards_id = None
 if 'retriever' not in st.session_state:
     st.session_state.retriever = None
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
-if 'lesson_plan_data' not in st.session_state:
-    st.session_state.lesson_plan_data = None
-if 'quiz_data' not in st.session_state:
-    st.session_state.quiz_data = None
+if 'lesson_plan_id' not in st.session_state:
+    st.session_state.lesson_plan_id = None
+if 'quiz_id' not in st.session_state:
+    st.session_state.quiz_id = None
 if 'quiz_answers' not in st.session_state:
     st.session_state.quiz_answers = {}
-if 'flashcards_generated' not in st.session_state:
-    st.session_state.flashcards_generated = False
+if 'learner_id' not in st.session_state:
+    # Review schedules belong to a learner; the ID rides in the URL so a bookmark keeps it
+    st.session_state.learner_id = st.query_params.get('learner') or uuid.uuid4().hex
+    st.query_params['learner'] = st.session_state.learner_id
+if 'review_scheduler' not in st.session_state:
+    st.session_state.review_scheduler = ReviewScheduler(st.session_state.learner_id)
+if 'review_revealed' not in st.session_state:
+    st.session_state.review_revealed = False
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if 'ingest_jobs' not in st.session_state:
+    st.session_state.ingest_jobs = []
+if 'activated_jobs' not in st.session_state:
+    st.session_state.activated_jobs = set()
+if 'stage_log' not in st.session_state:
+    st.session_state.stage_log = StageLog(maxlen=METRICS_SESSION_RECORDS)
 
 
 def input_fields():
@@ -90,8 +107,8 @@ def input_fields():
             key="doc_uploader"
         )
         if st.button("🚀 Process Documents", key="process_button"):
-            st.session_state.flashcards_generated = False
             process_documents()
+        job_panel()
     
 
 def process_documents():
@@ -99,67 +116,152 @@ def process_documents():
         st.warning("⚠️ Please provide OpenAI API key and upload documents.")
         return
     
+    # Imported here so PDF parsing stays off the app's startup path
+    from document_processor import DocumentProcessor
     try:
-        with st.spinner('🔄 Processing documents...'):
-            doc_processor = DocumentProcessor()
-            doc_processor.save_uploaded_files(st.session_state.source_docs)
-            documents = doc_processor.load_documents()
-            texts = doc_processor.split_documents(documents)
-            
-            vector_store = VectorStore(st.session_state.openai_api_key)
-            st.session_state.retriever = vector_store.create_local_store(texts)
-            
-            doc_processor.cleanup_temp_files()
-            st.success("✅ Documents processed successfully!")
-            
+        # Each upload gets its own directory and is indexed in the background;
+        # identical documents share one index and one in-flight job
+        upload_dir = workspace.session_dir(f"{st.session_state.session_id}/{uuid.uuid4().hex[:8]}")
+        paths = DocumentProcessor.save_uploaded_files(st.session_state.source_docs, upload_dir)
+        vector_store = resources.get_vector_store(st.session_state.openai_api_key)
+        job_id, created = get_job_runner().submit(
+            vector_store.corpus_dir(paths).name, ingest_job(vector_store, paths, upload_dir)
+        )
+        if not created:
+            DocumentProcessor.cleanup_temp_files(upload_dir)
+        if job_id not in st.session_state.ingest_jobs:
+            st.session_state.ingest_jobs.append(job_id)
+        st.info("📥 Documents queued for processing")
     except Exception as e:
         st.error(f"❌ An error occurred: {str(e)}")
 
+def activate_corpus(store_dir: str):
+    from study_artifacts import find_artifacts
+    vector_store = resources.get_vector_store(st.session_state.openai_api_key)
+    if st.session_state.retriever is not None:
+        resources.invalidate_retriever(st.session_state.retriever)
+    st.session_state.retriever = vector_store.open_local_store(store_dir)
+    # Artifacts prebuilt for these documents (e.g. by cli.py) show up right away
+    api_key = st.session_state.openai_api_key
+    found = find_artifacts(
+        st.session_state.retriever,
+        flashcards=resources.get_flashcard_generator(api_key),
+        planner=resources.get_lesson_plan_generator(api_key),
+        quiz_gen=resources.get_quiz_generator(api_key),
+    )
+    st.session_state.flashcards_id = found['flashcards']
+    st.session_state.lesson_plan_id = found['lesson_plan']
+    st.session_state.quiz_id = found['quiz']
+    st.session_state.quiz_answers = {}
+    if st.session_state.flashcards_id is not None:
+        st.session_state.review_scheduler.load(get_artifact_store().keys(st.session_state.flashcards_id))
+
+def job_panel():
+    """Status of this session's ingestion jobs; the newest finished one becomes the active corpus.
+
+    While a job is queued or running the panel polls on its own, so only it
+    reruns; once none is, the app reruns and the panel stops polling.
+    """
+    jobs = get_job_runner().jobs(st.session_state.ingest_jobs)
+    if any(job.active for job in jobs):
+        _polling_job_panel()
+    else:
+        _job_status(jobs)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _polling_job_panel():
+    jobs = get_job_runner().jobs(st.session_state.ingest_jobs)
+    _job_status(jobs)
+    if not any(job.active for job in jobs):
+        st.rerun()
+
+def _job_status(jobs):
+    finished = [job for job in jobs if job.status == 'done' and job.id not in st.session_state.activated_jobs]
+    if finished:
+        st.session_state.activated_jobs.update(job.id for job in finished)
+        activate_corpus(finished[-1].result)
+        st.toast("✅ Documents processed successfully!")
+        st.rerun()
+    for job in reversed(jobs[-5:]):
+        icon = {'queued': '⏳', 'running': '🔄', 'done': '✅', 'failed': '❌', 'cancelled': '🚫'}[job.status]
+        st.caption(f"{icon} {job.status} · {job.stage or 'waiting'} · {job.pages} pages · {job.chunks} chunks")
+        if job.error:
+            st.caption(f"⚠️ {job.error}")
+        if job.active and st.button("✖ Cancel", key=f"cancel_{job.id}"):
+            get_job_runner().cancel(job.id)
+
 def generate_flashcards():
     if st.session_state.retriever is None:
         st.warning("⚠️ Please process documents first.")
         return
         
-    # Clear existing flashcards
-    st.session_state.flashcards.data.clear()
-    
+    from study_artifacts import build_flashcards
     with st.spinner("🔄 Generating flashcards..."):
-        generator = FlashcardGeneratorOpenAI(api_key=st.session_state.openai_api_key)
-        docx = st.session_state.retriever.get_relevant_documents("")
-        # Track unique content
-        generated_content = set()
-        flashcard_count = 0
-        max_flashcards = 5
-        
-        # Process documents until we have enough flashcards
-        for doc in docx:
-            if flashcard_count >= max_flashcards:
-                break
-                
-            try:
-                content = doc.page_content[:200].strip()
-                if content and content not in generated_content:
-                    flashcard = generator.generate_flashcard(content)
-                    if flashcard and flashcard.input_expression:  # Verify valid flashcard
-                        st.session_state.flashcards.data.append(flashcard)
-                        generated_content.add(content)
-                        flashcard_count += 1
-            except Exception as e:
-                logger.error(f"Error generating flashcard: {str(e)}")
-                continue
-        
-        st.session_state.flashcards_generated = True
-        if flashcard_count > 0:
-            st.success(f"✅ Generated {flashcard_count} unique flashcards!")
-        else:
+        generator = resources.get_flashcard_generator(st.session_state.openai_api_key)
+        # Another session (or cli.py) may already have built this deck for the same documents
+        deck_id, created = build_flashcards(st.session_state.retriever, generator)
+        if deck_id is None:
             st.warning("⚠️ Could not generate any valid flashcards.")
+            return
+        store = get_artifact_store()
+        st.session_state.flashcards_id = deck_id
+        st.session_state.review_scheduler.load(store.keys(deck_id))
+        if created:
+            st.success(f"✅ Generated {store.size(deck_id)} unique flashcards!")
+        else:
+            st.success(f"✅ Loaded {store.size(deck_id)} saved flashcards!")
+
+def review_flashcards():
+    scheduler = st.session_state.review_scheduler
+    key = scheduler.next_due()
+    st.markdown("<h3 class='flashcard-header'>🧠 Review</h3>", unsafe_allow_html=True)
+    if key is None:
+        next_time = scheduler.next_due_time()
+        if next_time is not None:
+            st.info(f"🎉 Nothing due. Next review {time.strftime('%b %d %H:%M', time.localtime(next_time))}")
+        return
+    card = get_artifact_store().by_key(st.session_state.flashcards_id, key)
+    if card is None:
+        # The stored deck is gone; drop the stale id so the deck can be generated again
+        st.session_state.flashcards_id = None
+        scheduler.load([])
+        st.warning("⚠️ These flashcards are no longer available. Please generate them again.")
+        return
+    flashcard = Flashcard(**card)
+    st.markdown(f"**{flashcard.input_expression}**")
+    if not st.session_state.review_revealed:
+        if st.button("👀 Show answer", key="review_reveal"):
+            st.session_state.review_revealed = True
+            st.rerun()
+        return
+    st.markdown(f"**Answer:** {flashcard.output_expression}")
+    for column, (label, quality) in zip(st.columns(len(GRADES)), GRADES.items()):
+        if column.button(label, key=f"review_{label}"):
+            scheduler.record(key, quality)
+            st.session_state.review_revealed = False
+            st.rerun()
+
+def page_offset(name: str, total: int) -> int:
+    """Render a page picker when ``total`` items need more than one page and return the first item's offset."""
+    pages = max(1, -(-total // ARTIFACT_PAGE_SIZE))
+    if pages == 1:
+        return 0
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{name}_page")
+    return (int(page) - 1) * ARTIFACT_PAGE_SIZE
 
 def show_flashcards():
-    if len(st.session_state.flashcards.data) == 0:
+    if st.session_state.flashcards_id is None:
         st.info("💡 Generate flashcards by processing documents first")
     else:
+        review_flashcards()
+        if st.session_state.flashcards_id is None:
+            return
         st.markdown("<h3 class='flashcard-header'>📝 Your Flashcards</h3>", unsafe_allow_html=True)
-        for flashcard in st.session_state.flashcards.data:
+        store = get_artifact_store()
+        deck_id = st.session_state.flashcards_id
+        offset = page_offset("flashcards", store.size(deck_id))
+        for card in store.page(deck_id, offset, ARTIFACT_PAGE_SIZE):
+            flashcard = Flashcard(**card)
             with st.expander(f"🔍 {flashcard.input_expression}", expanded=False):
                 st.markdown(f"**Answer:** {flashcard.output_expression}")
                 st.markdown(f"**Example:** ✨ {flashcard.example_usage}")
@@ -191,14 +293,14 @@ def display_lesson_plan(lesson_plan_data: dict):
         st.markdown("### 🔍 Additional Resources")
         st.markdown(f"```{lesson_plan_data['resources']}```")
 
-def display_quiz(quiz_data: dict):
-    if quiz_data:
+def display_quiz(quiz_id: int):
+    store = get_artifact_store()
+    total = store.size(quiz_id)
+    if total:
         st.write("### 📝 Practice Quiz")
-        for idx, (q, a, d) in enumerate(zip(
-            quiz_data["questions"],
-            quiz_data["answers"],
-            quiz_data["difficulty"]
-        )):
+        offset = page_offset("quiz", total)
+        for idx, item in enumerate(store.page(quiz_id, offset, ARTIFACT_PAGE_SIZE), start=offset):
+            q, a, d = item["question"], item["answer"], item["difficulty"]
             st.write(f"**Question {idx+1}** ({d}) 📌")
             st.write(q)
             
@@ -214,7 +316,33 @@ def display_quiz(quiz_data: dict):
             st.divider()
 
 
+def timing_panel():
+    """Sidebar table of the stages this session ran, newest first."""
+    with st.sidebar.expander("⏱️ Timings", expanded=False):
+        records = st.session_state.stage_log.snapshot()
+        if not records:
+            st.caption("No stages recorded yet")
+            return
+        st.dataframe([
+            {
+                "stage": record.stage,
+                "ms": round(record.seconds * 1000, 1),
+                "items": record.items,
+                "KB": round(record.bytes / 1024, 1),
+                "tokens": f"{record.prompt_tokens}/{record.completion_tokens}",
+                "cache": f"{record.cache_hits}/{record.cache_hits + record.cache_misses}",
+            }
+            for record in reversed(records)
+        ], hide_index=True)
+        st.download_button("📈 Prometheus metrics", get_metrics().prometheus_text(),
+                           file_name="metrics.prom", key="metrics_download")
+
 def main():
+    collect_into(st.session_state.stage_log)
+    store_dir = (getattr(st.session_state.retriever, 'metadata', None) or {}).get('store_dir')
+    if store_dir:
+        # Keep this session's corpus from being garbage-collected while in use
+        workspace.touch(Path(store_dir))
     add_custom_css()
     
     st.markdown("<h1 class='main-header'>📚 STUDY BUDDY </h1>", unsafe_allow_html=True)
@@ -239,10 +367,14 @@ def main():
     if query := st.chat_input("Ask a question about your documents", key="chat_input"):
         st.chat_message("human", avatar="🧑").write(query)
         if st.session_state.retriever is not None:
-            chat_engine = ChatEngine(st.session_state.openai_api_key)
-            chain = chat_engine.create_chain(st.session_state.retriever)
-            response = chain.invoke(query)
-            st.chat_message("assistant", avatar="🤖").write(response)
+            chat_engine = resources.get_chat_engine(st.session_state.openai_api_key)
+            timings = []
+            with st.chat_message("assistant", avatar="🤖"):
+                response = st.write_stream(
+                    chat_engine.stream_answer(st.session_state.retriever, query, on_timing=timings.append)
+                )
+                timing = timings[0]
+                st.caption(f"⏱️ First token {timing.time_to_first_token:.2f}s · total {timing.total_latency:.2f}s")
             st.session_state.chat_history.append((query, response))
         else:
             st.warning("⚠️ Please process documents first.")
@@ -262,42 +394,55 @@ def main():
         tab1, tab2, tab3 = st.tabs(["📇 Flashcards", "📅 Lesson Plan", "📝 Quiz"])
         
         with tab1:
-            if not st.session_state.flashcards_generated:
+            if st.session_state.flashcards_id is None:
                 if st.button("✨ Generate Flashcards", key="flashcard_button"):
                     st.session_state.generating_flashcards = True
                     st.session_state.active_tab = "Flashcards"
                     generate_flashcards()
-                    st.experimental_rerun()
+                    st.rerun()
             show_flashcards()
         
         with tab2:
-            if not st.session_state.lesson_plan_data:
+            if st.session_state.lesson_plan_id is None:
+                whole_corpus = st.checkbox("📚 Cover all documents (slower)", key="plan_whole_corpus")
                 if st.button("✨ Generate Lesson Plan", key="plan_button"):
                     st.session_state.generating_lesson_plan = True
                     st.session_state.active_tab = "Lesson Plan"
+                    from study_artifacts import build_lesson_plan
                     with st.spinner("🔄 Creating your personalized lesson plan..."):
-                        planner = LessonPlanGenerator(st.session_state.openai_api_key)
-                        documents = st.session_state.retriever.get_relevant_documents("")
-                        content = "\n".join([doc.page_content for doc in documents])
-                        st.session_state.lesson_plan_data = planner.generate_plan(content)
-                    st.experimental_rerun()
-            if st.session_state.lesson_plan_data:
-                display_lesson_plan(st.session_state.lesson_plan_data)
+                        planner = resources.get_lesson_plan_generator(st.session_state.openai_api_key)
+                        try:
+                            st.session_state.lesson_plan_id, _ = build_lesson_plan(
+                                st.session_state.retriever, planner, whole_corpus
+                            )
+                        except Exception as e:
+                            st.error(f"❌ Could not create a lesson plan: {str(e)}")
+                    if st.session_state.lesson_plan_id is not None:
+                        st.rerun()
+            if st.session_state.lesson_plan_id is not None:
+                display_lesson_plan(get_artifact_store().first(st.session_state.lesson_plan_id))
         
         with tab3:
-            if not st.session_state.quiz_data:
+            if st.session_state.quiz_id is None:
+                whole_corpus = st.checkbox("📚 Cover all documents (slower)", key="quiz_whole_corpus")
                 if st.button("🎯 Generate Quiz", key="quiz_button"):
                     st.session_state.generating_quiz = True
                     st.session_state.active_tab = "Quiz"
+                    from study_artifacts import build_quiz
                     with st.spinner("🔄 Creating your practice quiz..."):
-                        quiz_gen = QuizGenerator(st.session_state.openai_api_key)
-                        documents = st.session_state.retriever.get_relevant_documents("")
-                        content = "\n".join([doc.page_content for doc in documents])
-                        st.session_state.quiz_data = quiz_gen.generate_quiz(content)
-                        st.session_state.quiz_answers = {}
-                    st.experimental_rerun()
-            if st.session_state.quiz_data:
-                display_quiz(st.session_state.quiz_data)
+                        quiz_gen = resources.get_quiz_generator(st.session_state.openai_api_key)
+                        try:
+                            st.session_state.quiz_id, _ = build_quiz(st.session_state.retriever, quiz_gen,
+                                                                     whole_corpus)
+                            st.session_state.quiz_answers = {}
+                        except Exception as e:
+                            st.error(f"❌ Could not create a quiz: {str(e)}")
+                    if st.session_state.quiz_id is not None:
+                        st.rerun()
+            if st.session_state.quiz_id is not None:
+                display_quiz(st.session_state.quiz_id)
+
+    timing_panel()
 
 
 if __name__ == '__main__':
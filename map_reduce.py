@@ -0,0 +1,137 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import List, Optional
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+from context_packer import count_tokens, pack_context, prompt_budget
+from llm_cache import invoke_cached
+from metrics import propagate
+from config import (
+    MAP_REDUCE_CONCURRENCY, MAP_GROUP_TOKENS, MAP_OUTPUT_TOKENS, MAP_REDUCE_TOKEN_BUDGET, REDUCE_MAX_LEVELS,
+    MAP_REDUCE_MAX_FAILED_FRACTION
+)
+
+logger = logging.getLogger(__name__)
+
+MAP_TEMPLATE = """Extract study notes from the following course material: {content}
+List the key topics and concepts, then several candidate quiz questions with short answers.
+Be concise and use bullet points.
+"""
+
+REDUCE_TEMPLATE = """Merge the following study notes into one concise set: {content}
+Keep every distinct key topic and the best candidate questions, and drop duplicates.
+Use bullet points.
+"""
+
+
+class MapReduceGenerator:
+    """Builds a quiz or lesson plan from a whole corpus instead of a few retrieved chunks.
+
+    Map: chunks are grouped per source file into groups of about
+    ``group_tokens`` tokens and each group is condensed into notes
+    concurrently. Reduce: notes are merged in rounds until they fit the
+    generator's own context budget, then the generator runs once on them.
+    Map and reduce prompts and outputs all count against ``token_budget``;
+    a reduce round that would overrun it is skipped and the notes are packed
+    as they are.
+    Every map and reduce call goes through the shared response cache, so a
+    group whose chunks haven't changed is never summarised twice. A round in
+    which more than ``max_failed_fraction`` of the calls fail raises rather
+    than quietly generating from whatever notes are left.
+    """
+
+    def __init__(self, generator, max_concurrency: int = MAP_REDUCE_CONCURRENCY,
+                 group_tokens: int = MAP_GROUP_TOKENS, token_budget: int = MAP_REDUCE_TOKEN_BUDGET,
+                 max_failed_fraction: float = MAP_REDUCE_MAX_FAILED_FRACTION):
+        self.generator = generator
+        self.max_failed_fraction = max_failed_fraction
+        self.max_concurrency = max_concurrency
+        self.group_tokens = group_tokens
+        self.token_budget = token_budget
+        self.map_prompt = ChatPromptTemplate.from_template(MAP_TEMPLATE)
+        self.reduce_prompt = ChatPromptTemplate.from_template(REDUCE_TEMPLATE)
+
+    @property
+    def model(self) -> str:
+        return self.generator.model
+
+    def generate_quiz(self, documents: List[Document]) -> dict:
+        return self.generator.generate_quiz(self.condense(documents))
+
+    def generate_plan(self, documents: List[Document]) -> dict:
+        return self.generator.generate_plan(self.condense(documents))
+
+    def condense(self, documents: List[Document]) -> str:
+        """Reduce ``documents`` to notes that fit the generator's context budget."""
+        groups = self._sample(self._group(documents))
+        notes = self._run(self.map_prompt, groups)
+        spent = self._prompt_tokens(self.map_prompt, groups) + self._tokens(notes)
+        budget = self.generator.context_budget()
+        for _ in range(REDUCE_MAX_LEVELS):
+            if len(notes) <= 1 or count_tokens("\n".join(notes), self.model) <= budget:
+                break
+            batches = self._batch(notes, prompt_budget(self.reduce_prompt, self.model))
+            prompt_tokens = self._prompt_tokens(self.reduce_prompt, batches)
+            if spent + prompt_tokens + len(batches) * MAP_OUTPUT_TOKENS > self.token_budget:
+                logger.info(f"Map-reduce: {spent} of {self.token_budget} tokens spent, "
+                            f"packing {len(notes)} notes without another reduce round")
+                break
+            notes = self._run(self.reduce_prompt, batches)
+            spent += prompt_tokens + self._tokens(notes)
+        notes_docs = [Document(page_content=note) for note in notes]
+        return pack_context(notes_docs, budget, model=self.model)
+
+    def _group(self, documents: List[Document]) -> List[str]:
+        # Groups never span source files, so adding a file leaves the other
+        # files' groups (and their cached map outputs) untouched
+        groups = []
+        for _, source_docs in groupby(documents, key=lambda doc: doc.metadata.get('source')):
+            groups.extend(self._batch([doc.page_content for doc in source_docs], self.group_tokens))
+        return groups
+
+    def _batch(self, texts: List[str], max_tokens: int) -> List[str]:
+        batches, current, used = [], [], 0
+        for text in texts:
+            tokens = count_tokens(text, self.model)
+            if current and used + tokens > max_tokens:
+                batches.append("\n".join(current))
+                current, used = [], 0
+            current.append(text)
+            used += tokens
+        if current:
+            batches.append("\n".join(current))
+        return batches
+
+    def _tokens(self, texts: List[str]) -> int:
+        return sum(count_tokens(text, self.model) for text in texts)
+
+    def _prompt_tokens(self, prompt: ChatPromptTemplate, contents: List[str]) -> int:
+        return self._tokens(contents) + len(contents) * count_tokens(prompt.format(content=""), self.model)
+
+    def _sample(self, groups: List[str]) -> List[str]:
+        """Keep an evenly spaced subset of groups when map-reducing all of them would exceed the token budget."""
+        # Each group's note is written by the map step and read back by the reduce step
+        total = self._prompt_tokens(self.map_prompt, groups) + len(groups) * 2 * MAP_OUTPUT_TOKENS
+        if total <= self.token_budget:
+            return groups
+        keep = max(1, int(len(groups) * self.token_budget / total))
+        stride = len(groups) / keep
+        logger.info(f"Map-reduce: ~{total} tokens over budget {self.token_budget}, "
+                    f"sampling {keep} of {len(groups)} chunk groups")
+        return [groups[int(i * stride)] for i in range(keep)]
+
+    def _run(self, prompt: ChatPromptTemplate, contents: List[str]) -> List[str]:
+        def call(content: str) -> Optional[str]:
+            try:
+                return invoke_cached(self.generator.chat, prompt.format_messages(content=content))
+            except Exception as e:
+                logger.error(f"Map-reduce step failed: {str(e)}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(contents)))) as executor:
+            results = [result for result in executor.map(propagate(call), contents) if result]
+        failed = len(contents) - len(results)
+        if contents and (not results or failed > self.max_failed_fraction * len(contents)):
+            raise RuntimeError(f"Map-reduce failed: {failed} of {len(contents)} steps returned no notes")
+        return results
@@ -0,0 +1,255 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from config import (
+    METRICS_BUCKETS, METRICS_LOG_PATH, METRICS_PROMETHEUS_PATH, METRICS_FLUSH_SECONDS, METRICS_LOG_BUFFER_LINES,
+    METRICS_LOG_MAX_BYTES
+)
+
+logger = logging.getLogger(__name__)
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+# Where the current Streamlit session collects its own stage records
+_collector = contextvars.ContextVar('stage_collector', default=None)
+
+
+@dataclass
+class StageRecord:
+    """One timed run of a pipeline stage and what it processed."""
+    stage: str
+    seconds: float = 0.0
+    items: int = 0
+    bytes: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    error: bool = False
+    labels: Dict[str, str] = field(default_factory=dict)
+    timestamp: float = field(default_factory=time.time)
+
+    @contextmanager
+    def timer(self):
+        """Add the time spent inside the block to ``seconds``; may be entered many times."""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class StageLog:
+    """Bounded list of one session's recent stage records.
+
+    Worker threads append while the session's script renders it, so reads go
+    through ``snapshot`` under the same lock.
+    """
+
+    def __init__(self, maxlen: int):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def append(self, record: StageRecord):
+        with self._lock:
+            self._records.append(record)
+
+    def snapshot(self) -> List[StageRecord]:
+        with self._lock:
+            return list(self._records)
+
+
+class Metrics:
+    """Process-wide stage metrics, exported as Prometheus text and JSON lines.
+
+    Every recorded stage updates in-memory counters and a latency histogram
+    per (stage, labels), is queued for the JSON-lines log, and is handed to the
+    collector of the session that triggered it, if any. A background thread
+    appends queued lines and rewrites this process's Prometheus file every
+    ``flush_seconds`` (sooner when the queue fills), so recording never
+    touches the disk.
+    """
+
+    def __init__(self, log_path=METRICS_LOG_PATH, buckets=METRICS_BUCKETS,
+                 prometheus_path=METRICS_PROMETHEUS_PATH, flush_seconds: float = METRICS_FLUSH_SECONDS,
+                 max_log_bytes: int = METRICS_LOG_MAX_BYTES):
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self.buckets = tuple(buckets)
+        self.flush_seconds = flush_seconds
+        self.max_log_bytes = max_log_bytes
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._series: Dict[Tuple, dict] = {}
+        self._pending: List[str] = []
+        self._dirty = False
+        self._wake = threading.Event()
+        self._flusher = None
+
+    def record(self, record: StageRecord):
+        key = (record.stage, tuple(sorted(record.labels.items())))
+        line = json.dumps(asdict(record))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'count': 0, 'seconds': 0.0, 'buckets': [0] * len(self.buckets), 'items': 0, 'bytes': 0,
+                    'prompt_tokens': 0, 'completion_tokens': 0, 'cache_hits': 0, 'cache_misses': 0, 'errors': 0,
+                }
+            series['count'] += 1
+            series['seconds'] += record.seconds
+            for i, bound in enumerate(self.buckets):
+                if record.seconds <= bound:
+                    series['buckets'][i] += 1
+            for name in ('items', 'bytes', 'prompt_tokens', 'completion_tokens', 'cache_hits', 'cache_misses'):
+                series[name] += getattr(record, name)
+            series['errors'] += int(record.error)
+            if self.log_path:
+                self._pending.append(line)
+                if len(self._pending) >= METRICS_LOG_BUFFER_LINES:
+                    self._wake.set()
+            self._dirty = True
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+                atexit.register(self.close)
+        collector = _collector.get()
+        if collector is not None:
+            collector.append(record)
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"Writing metrics failed: {str(e)}")
+
+    def flush(self):
+        """Append queued records to the JSON-lines log and refresh this process's Prometheus file."""
+        with self._lock:
+            lines, self._pending = self._pending, []
+            dirty, self._dirty = self._dirty, False
+        with self._io_lock:
+            if lines and self.log_path:
+                self._append(lines)
+            if dirty and self.prometheus_path:
+                self.write_prometheus()
+
+    def _append(self, lines: List[str]):
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+            size = f.tell()
+        if self.max_log_bytes and size > self.max_log_bytes:
+            os.replace(self.log_path, f"{self.log_path}.1")
+
+    def close(self):
+        """Flush at exit and drop this process's Prometheus file so no stale series outlive it."""
+        try:
+            self.flush()
+            if self.prometheus_path:
+                self.process_prometheus_path().unlink(missing_ok=True)
+        except OSError as e:
+            logger.error(f"Writing metrics failed: {str(e)}")
+
+    def process_prometheus_path(self) -> Path:
+        path = Path(self.prometheus_path)
+        return path.with_name(f"{path.stem}.{os.getpid()}{path.suffix}")
+
+    def prometheus_text(self, **const_labels) -> str:
+        """Render all series in the Prometheus text exposition format, with ``const_labels`` on each."""
+        with self._lock:
+            series = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._series.items()}
+
+        def labels(stage, extra, **more):
+            pairs = [('stage', stage), *const_labels.items(), *extra, *more.items()]
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+        lines = [
+            "# HELP studybuddy_stage_seconds Wall time per pipeline stage run.",
+            "# TYPE studybuddy_stage_seconds histogram",
+        ]
+        for (stage, extra), s in sorted(series.items()):
+            for bound, count in zip(self.buckets, s['buckets']):
+                lines.append(f"studybuddy_stage_seconds_bucket{labels(stage, extra, le=bound)} {count}")
+            lines.append(f"studybuddy_stage_seconds_bucket{labels(stage, extra, le='+Inf')} {s['count']}")
+            lines.append(f"studybuddy_stage_seconds_sum{labels(stage, extra)} {s['seconds']:.6f}")
+            lines.append(f"studybuddy_stage_seconds_count{labels(stage, extra)} {s['count']}")
+        for metric, help_text, fields in [
+            ('studybuddy_stage_items_total', 'Items processed per stage.', [('items', {})]),
+            ('studybuddy_stage_bytes_total', 'Bytes processed per stage.', [('bytes', {})]),
+            ('studybuddy_stage_errors_total', 'Stage runs that raised.', [('errors', {})]),
+            ('studybuddy_llm_tokens_total', 'LLM tokens per stage.',
+             [('prompt_tokens', {'type': 'prompt'}), ('completion_tokens', {'type': 'completion'})]),
+            ('studybuddy_cache_requests_total', 'Cache lookups per stage.',
+             [('cache_hits', {'result': 'hit'}), ('cache_misses', {'result': 'miss'})]),
+        ]:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (stage, extra), s in sorted(series.items()):
+                for name, more in fields:
+                    lines.append(f"{metric}{labels(stage, extra, **more)} {s[name]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Write the exposition atomically, e.g. for node_exporter's textfile collector.
+
+        By default each process writes its own file and labels its series with
+        its ``pid``, so several app or server processes never overwrite or
+        collide with each other.
+        """
+        if path is None:
+            path, text = self.process_prometheus_path(), self.prometheus_text(pid=os.getpid())
+        else:
+            text = self.prometheus_text()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def get_metrics() -> Metrics:
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+        return _metrics
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """Time the block as one run of stage ``name``; the yielded record takes counts."""
+    record = StageRecord(stage=name, labels={key: str(value) for key, value in labels.items()})
+    try:
+        with record.timer():
+            yield record
+    except BaseException:
+        record.error = True
+        raise
+    finally:
+        get_metrics().record(record)
+
+
+def collect_into(sink: Optional[StageLog]):
+    """Send stage records from this context (and contexts copied from it) to ``sink``."""
+    _collector.set(sink)
+
+
+def propagate(fn):
+    """Wrap ``fn`` so that worker threads report to the calling session's collector."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
@@ -11,6 +11,13 @@ class ChatMessage:
     role: str
     content: str
 
+@dataclass
+class QueryTiming:
+    query: str
+    time_to_first_token: float
+    total_latency: float
+    cached: bool = False
+
 @dataclass
 class ChatHistory:
     messages: List[ChatMessage]
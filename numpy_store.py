@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore as BaseVectorStore
+
+VECTORS_NAME = 'vectors.f32'
+CHUNKS_NAME = 'chunks.sqlite3'
+
+
+class NumpyVectorStore(BaseVectorStore):
+    """In-process vector index over a memory-mapped float32 matrix.
+
+    Row ``i`` of ``vectors.f32`` holds the L2-normalised embedding of the chunk
+    stored in row ``i`` of the ``chunks`` side table, so cosine similarity is a
+    single matrix-vector product. The matrix is append-only: updated or deleted
+    chunks are tombstoned in the side table. Only the first ``rows`` rows (kept
+    in ``meta`` and committed with the side table) are live; anything past them
+    is left over from an aborted write and gets overwritten by the next one.
+    Because the file is mapped rather
+    than read, opening is instant and every worker process shares one copy in
+    the page cache.
+
+    Takes the same ``persist_directory`` / ``embedding_function`` arguments as
+    Chroma so it can be swapped in through ``LOCAL_VECTOR_STORE_BACKEND``.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function: Embeddings, **kwargs: Any):
+        self.directory = Path(persist_directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = embedding_function
+        self.vectors_path = self.directory.joinpath(VECTORS_NAME)
+        self.vectors_path.touch(exist_ok=True)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._matrix = None
+        self._dead = np.zeros(0, dtype=bool)
+        self._version = None
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_id ON chunks(id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"""
+        )
+        conn.commit()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.directory.joinpath(CHUNKS_NAME).as_posix(), timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def dim(self) -> Optional[int]:
+        value = self._meta('dim')
+        return int(value) if value else None
+
+    def _rows(self) -> int:
+        """Number of committed rows in the vector file."""
+        return int(self._meta('rows') or 0)
+
+    def _load(self):
+        """Return (matrix, dead mask), remapping only when another writer changed the store."""
+        with self._lock:
+            version = self._meta('version')
+            if version == self._version and self._matrix is not None:
+                return self._matrix, self._dead
+            dim = self.dim
+            rows = self._rows() if dim else 0
+            if rows:
+                matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(rows, dim))
+            else:
+                matrix = np.zeros((0, dim or 0), dtype=np.float32)
+            dead = np.zeros(rows, dtype=bool)
+            dead_rows = [r for (r,) in self._connection().execute(
+                "SELECT row FROM chunks WHERE deleted = 1 AND row < ?", (rows,))]
+            dead[dead_rows] = True
+            self._matrix, self._dead, self._version = matrix, dead, version
+            return matrix, dead
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [os.urandom(8).hex() for _ in texts]
+        vectors = self._normalize(self.embedding_function.embed_documents(texts))
+
+        conn = self._connection()
+        # BEGIN IMMEDIATE serialises writers across processes, keeping the
+        # vector file and the side table in step
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            dim = self.dim
+            if dim is None:
+                dim = vectors.shape[1]
+                conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+            elif dim != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {dim}")
+            start = self._rows()
+            self._tombstone(conn, ids)
+            conn.executemany(
+                "INSERT INTO chunks (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(start + i, chunk_id, text, json.dumps(metadata))
+                 for i, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas))]
+            )
+            # Write at the committed end, over any rows an aborted write left behind
+            with open(self.vectors_path, 'r+b') as f:
+                f.seek(start * 4 * dim)
+                f.write(vectors.tobytes())
+                f.truncate()
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('rows', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (str(start + len(texts)),)
+            )
+            self._bump_version(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._tombstone(conn, ids)
+            self._bump_version(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return True
+
+    @staticmethod
+    def _tombstone(conn: sqlite3.Connection, ids: List[str]):
+        conn.executemany("UPDATE chunks SET deleted = 1 WHERE id = ? AND deleted = 0", [(i,) for i in ids])
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def persist(self):
+        """Writes are durable as soon as add_texts/delete return; kept for Chroma parity."""
+
+    def _fetch(self, rows: List[int]) -> dict:
+        placeholders = ",".join("?" * len(rows))
+        result = self._connection().execute(
+            f"SELECT row, id, text, metadata FROM chunks WHERE row IN ({placeholders})", rows
+        )
+        return {row: Document(id=chunk_id, page_content=text, metadata=json.loads(metadata))
+                for row, chunk_id, text, metadata in result}
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> dict:
+        """Live chunks in insertion order, in the same shape as ``Chroma.get``."""
+        include = include or ['documents', 'metadatas']
+        matrix, dead = self._load()
+        query = "SELECT row, id, text, metadata FROM chunks WHERE deleted = 0 AND row < ?"
+        params = [len(dead)]
+        if ids is not None:
+            query += f" AND id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        rows = self._connection().execute(query + " ORDER BY row", params).fetchall()
+        result = {'ids': [chunk_id for _, chunk_id, _, _ in rows]}
+        if 'documents' in include:
+            result['documents'] = [text for _, _, text, _ in rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [json.loads(metadata) for _, _, _, metadata in rows]
+        if 'embeddings' in include:
+            result['embeddings'] = np.asarray(matrix[[row for row, _, _, _ in rows]])
+        return result
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Top-k (document, cosine similarity) for each query vector in one matrix product."""
+        matrix, dead = self._load()
+        queries = self._normalize(np.atleast_2d(embeddings))
+        live = len(dead) - int(dead.sum())
+        k = min(k, live)
+        if k <= 0:
+            return [[] for _ in queries]
+
+        scores = queries @ matrix.T
+        scores[:, dead] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        docs = self._fetch(sorted({int(r) for r in top.ravel()}))
+        return [[(docs[int(r)], float(s)) for r, s in zip(rows, row_scores)]
+                for rows, row_scores in zip(top, top_scores)]
+
+    def similarity_search_batch(self, queries: List[str], k: int = 4) -> List[List[Document]]:
+        vectors = self.embedding_function.embed_documents(list(queries))
+        return [[doc for doc, _ in hits] for hits in self.similarity_search_by_vectors(vectors, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vectors([self.embedding_function.embed_query(query)], k)[0]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vectors([embedding], k)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, persist_directory: str = None,
+                   **kwargs: Any) -> "NumpyVectorStore":
+        store = cls(persist_directory=persist_directory, embedding_function=embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
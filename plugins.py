@@ -0,0 +1,42 @@
+import importlib
+import threading
+
+
+def load_object(target: str):
+    """Import ``"package.module:attribute"`` and return the attribute."""
+    module_name, _, attribute = target.partition(':')
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute) if attribute else module
+
+
+class LazyRegistry:
+    """Maps names to ``"module:attribute"`` targets that are only imported on first use."""
+
+    def __init__(self, kind: str, targets: dict = None):
+        self.kind = kind
+        self._targets = dict(targets or {})
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, target):
+        """Register a dotted ``"module:attribute"`` target or an already imported object."""
+        with self._lock:
+            self._loaded.pop(name, None)
+            if isinstance(target, str):
+                self._targets[name] = target
+            else:
+                self._targets[name] = None
+                self._loaded[name] = target
+
+    def get(self, name: str):
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            if name not in self._targets:
+                raise KeyError(f"Unknown {self.kind} '{name}'. Available: {', '.join(sorted(self._targets))}")
+            obj = load_object(self._targets[name])
+            self._loaded[name] = obj
+            return obj
+
+    def names(self):
+        return sorted(self._targets)
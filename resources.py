@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+import httpx
+from plugins import LazyRegistry
+from config import (
+    DEFAULT_MODEL, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY, HTTP_TIMEOUT, MAX_CACHED_CHAINS
+)
+
+# Process-wide registry of long-lived clients, generators and chains.
+# Streamlit reruns the whole script on every interaction; handing out shared
+# instances keeps HTTP connections (and their TLS sessions) alive across reruns.
+
+# Components are imported on first use so that a fresh worker only pays for
+# the modules the current session actually touches.
+COMPONENTS = LazyRegistry('component', {
+    'chat': 'chat_engine:ChatEngine',
+    'flashcards': 'flashcard_generator:FlashcardGeneratorOpenAI',
+    'quiz': 'learning_tools:QuizGenerator',
+    'lesson_plan': 'learning_tools:LessonPlanGenerator',
+    'vector_store': 'vector_store:VectorStore',
+})
+
+_lock = threading.RLock()
+_http_client = None
+_instances = {}
+_chains = OrderedDict()
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                ),
+                timeout=HTTP_TIMEOUT
+            )
+        return _http_client
+
+
+def _get_instance(kind: str, api_key: str, model: str, factory):
+    key = (kind, api_key, model)
+    with _lock:
+        instance = _instances.get(key)
+        if instance is None:
+            instance = factory()
+            _instances[key] = instance
+        return instance
+
+
+def get_chat_engine(api_key: str, model: str = DEFAULT_MODEL):
+    return _get_instance('chat', api_key, model,
+                         lambda: COMPONENTS.get('chat')(api_key, model=model, http_client=get_http_client()))
+
+
+def get_flashcard_generator(api_key: str, model: str = DEFAULT_MODEL):
+    return _get_instance('flashcards', api_key, model,
+                         lambda: COMPONENTS.get('flashcards')(api_key, llm_model=model, http_client=get_http_client()))
+
+
+def get_quiz_generator(api_key: str, model: str = DEFAULT_MODEL):
+    return _get_instance('quiz', api_key, model,
+                         lambda: COMPONENTS.get('quiz')(api_key, llm_model=model, http_client=get_http_client()))
+
+
+def get_lesson_plan_generator(api_key: str, model: str = DEFAULT_MODEL):
+    return _get_instance('lesson_plan', api_key, model,
+                         lambda: COMPONENTS.get('lesson_plan')(api_key, llm_model=model, http_client=get_http_client()))
+
+
+def get_vector_store(api_key: str):
+    return _get_instance('vector_store', api_key, '',
+                         lambda: COMPONENTS.get('vector_store')(api_key, http_client=get_http_client()))
+
+
+def get_chat_chain(api_key: str, retriever, model: str = DEFAULT_MODEL):
+    """Return the chat chain bound to ``retriever``, building it once per retriever.
+
+    At most MAX_CACHED_CHAINS chains are kept, least recently used first out;
+    call ``invalidate_retriever`` when a session replaces its retriever.
+    """
+    key = (api_key, model, id(retriever))
+    with _lock:
+        entry = _chains.get(key)
+        # The id may have been reused by a newer retriever
+        if entry is not None and entry[0] is retriever:
+            _chains.move_to_end(key)
+            return entry[1]
+        chain = get_chat_engine(api_key, model).create_chain(retriever)
+        _chains[key] = (retriever, chain)
+        while len(_chains) > MAX_CACHED_CHAINS:
+            _chains.popitem(last=False)
+        return chain
+
+
+def invalidate_retriever(retriever):
+    """Forget every chain built for ``retriever``."""
+    with _lock:
+        for key in [key for key, entry in _chains.items() if entry[0] is retriever]:
+            del _chains[key]
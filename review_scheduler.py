@@ -0,0 +1,165 @@
+import hashlib
+import heapq
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import REVIEW_DB_PATH, REVIEW_INITIAL_EASE, REVIEW_MIN_EASE, REVIEW_RELEARN_SECONDS
+
+# SQLite caps the number of bound parameters per statement
+_SQL_BATCH = 500
+DAY_SECONDS = 24 * 3600
+
+# Answer buttons mapped to SM-2 quality grades (0-5)
+GRADES = {"Again": 1, "Hard": 3, "Good": 4, "Easy": 5}
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def _shared_connection(path) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """One connection (and the lock serialising its use) per database per process, shared by every scheduler."""
+    path = str(path)
+    with _connections_lock:
+        if path not in _connections:
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS reviews (
+                    owner TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    due REAL NOT NULL,
+                    interval REAL NOT NULL,
+                    ease REAL NOT NULL,
+                    repetitions INTEGER NOT NULL,
+                    lapses INTEGER NOT NULL,
+                    PRIMARY KEY (owner, key)
+                )"""
+            )
+            conn.commit()
+            _connections[path] = (conn, threading.Lock())
+        return _connections[path]
+
+
+def card_key(flashcard) -> str:
+    """Stable identity for a flashcard, so review state survives regeneration of the same card."""
+    text = f"{flashcard.input_expression}\x00{flashcard.output_expression}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class ReviewState:
+    __slots__ = ("due", "interval", "ease", "repetitions", "lapses")
+
+    def __init__(self, due: float, interval: float = 0.0, ease: float = REVIEW_INITIAL_EASE,
+                 repetitions: int = 0, lapses: int = 0):
+        self.due = due
+        self.interval = interval
+        self.ease = ease
+        self.repetitions = repetitions
+        self.lapses = lapses
+
+
+class ReviewScheduler:
+    """SM-2 spaced-repetition scheduler over a deck of card keys.
+
+    Due cards sit in a min-heap ordered by due time, so ``next_due`` and
+    ``record`` are O(log n). Rescheduling pushes a fresh heap entry and the
+    old one is dropped lazily when it surfaces with a stale due time. Each
+    answer writes a single row, so the deck is never re-serialised. Rows are
+    keyed by ``(owner, key)``, so learners sharing a deck keep separate schedules.
+    """
+
+    def __init__(self, owner: str = '', path=REVIEW_DB_PATH):
+        self.owner = owner
+        self.states: Dict[str, ReviewState] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._conn, self._db_lock = _shared_connection(path)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def load(self, keys: Iterable[str], now: Optional[float] = None):
+        """Make ``keys`` the active deck, restoring stored state and adding unseen cards as due now."""
+        now = time.time() if now is None else now
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            states = {}
+            with self._db_lock:
+                for i in range(0, len(keys), _SQL_BATCH):
+                    batch = keys[i:i + _SQL_BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        "SELECT key, due, interval, ease, repetitions, lapses FROM reviews "
+                        f"WHERE owner = ? AND key IN ({placeholders})",
+                        [self.owner, *batch]
+                    )
+                    for key, *fields in rows:
+                        states[key] = ReviewState(*fields)
+                new = [key for key in keys if key not in states]
+                for key in new:
+                    states[key] = ReviewState(due=now)
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO reviews (owner, key, due, interval, ease, repetitions, lapses) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [self._row(key, states[key]) for key in new]
+                )
+                self._conn.commit()
+            self.states = states
+            self._heap = [(state.due, key) for key, state in states.items()]
+            heapq.heapify(self._heap)
+
+    def _row(self, key: str, state: ReviewState) -> tuple:
+        return self.owner, key, state.due, state.interval, state.ease, state.repetitions, state.lapses
+
+    def _peek(self) -> Optional[Tuple[float, str]]:
+        # Drop entries superseded by a later reschedule
+        while self._heap:
+            due, key = self._heap[0]
+            state = self.states.get(key)
+            if state is not None and state.due == due:
+                return due, key
+            heapq.heappop(self._heap)
+        return None
+
+    def next_due(self, now: Optional[float] = None) -> Optional[str]:
+        """Key of the most overdue card, or None when nothing is due yet."""
+        now = time.time() if now is None else now
+        with self._lock:
+            top = self._peek()
+        return top[1] if top and top[0] <= now else None
+
+    def next_due_time(self) -> Optional[float]:
+        with self._lock:
+            top = self._peek()
+        return top[0] if top else None
+
+    def record(self, key: str, quality: int, now: Optional[float] = None) -> ReviewState:
+        """Apply an SM-2 grade (0-5) to ``key``, reschedule it and persist its row."""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self.states[key]
+            if quality < 3:
+                state.repetitions = 0
+                state.interval = 0.0
+                state.lapses += 1
+                state.due = now + REVIEW_RELEARN_SECONDS
+            else:
+                if state.repetitions == 0:
+                    state.interval = 1.0
+                elif state.repetitions == 1:
+                    state.interval = 6.0
+                else:
+                    state.interval = round(state.interval * state.ease)
+                state.repetitions += 1
+                state.due = now + state.interval * DAY_SECONDS
+            state.ease = max(REVIEW_MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+            heapq.heappush(self._heap, (state.due, key))
+            with self._db_lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO reviews (owner, key, due, interval, ease, repetitions, lapses) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self._row(key, state)
+                )
+                self._conn.commit()
+            return state
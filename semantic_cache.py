@@ -0,0 +1,106 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+import numpy as np
+from config import SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_THRESHOLD
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    chunk_ids: List[str]
+    similarity: float
+
+
+class SemanticAnswerCache:
+    """Serves a previous answer to a query whose embedding is close to an earlier one.
+
+    Entries hold (normalised query embedding, retrieved chunk IDs, answer,
+    corpus version). A lookup is one matrix-vector product over all entries;
+    only entries built against the current corpus version can match, and when
+    the caller passes the chunks its query retrieves lexically, only entries
+    answered from at least one of them. The
+    least recently used entry is evicted once ``max_entries`` is reached.
+    """
+
+    def __init__(self, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._last_used = np.full(max_entries, -np.inf)
+        # Corpus versions are interned to small ints so the version filter is vectorised too
+        self._version_ids = {}
+        self._versions = np.full(max_entries, -1, dtype=np.int64)
+        self._entries: List[Optional[tuple]] = [None] * max_entries
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query_embedding, corpus_version: str,
+               chunk_ids: Optional[Iterable[str]] = None) -> Optional[CachedAnswer]:
+        query = self._normalize(query_embedding)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ query
+            similarities[self._versions != self._version_ids.get(corpus_version, -2)] = -np.inf
+            slot = int(np.argmax(similarities))
+            if similarities[slot] < self.threshold:
+                self.misses += 1
+                return None
+            answer, cached_ids = self._entries[slot]
+            # Near-identical wording about different passages ("section 4.2" vs "4.3") is not a hit
+            if chunk_ids is not None and set(chunk_ids).isdisjoint(cached_ids):
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[slot] = time.monotonic()
+            return CachedAnswer(answer=answer, chunk_ids=list(cached_ids), similarity=float(similarities[slot]))
+
+    def add(self, query_embedding, chunk_ids: List[str], answer: str, corpus_version: str):
+        query = self._normalize(query_embedding)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self._vectors = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+                self._last_used[:] = -np.inf
+                self._versions[:] = -1
+                self._entries = [None] * self.max_entries
+            # Empty slots have last_used = -inf, so they are filled before anything is evicted
+            slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = query
+            self._last_used[slot] = time.monotonic()
+            self._versions[slot] = self._version_ids.setdefault(corpus_version, len(self._version_ids))
+            self._entries[slot] = (answer, list(chunk_ids))
+
+    def __len__(self):
+        return sum(entry is not None for entry in self._entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticAnswerCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache()
+        return _cache
@@ -0,0 +1,352 @@
+"""Asynchronous HTTP API for ingestion, retrieval, chat and study artifacts.
+
+    POST /corpora                          multipart PDFs -> 202 {"job", "corpus"}
+    GET  /jobs/{job}                       ingestion job status and progress
+    POST /corpora/{corpus}/search          {"query"} -> retrieved chunks
+    POST /corpora/{corpus}/chat            {"query"} -> {"answer", "cached", "seconds"}
+    POST /corpora/{corpus}/flashcards      ?offset&limit -> stored or newly generated deck
+    POST /corpora/{corpus}/quiz            {"whole_corpus"} ?offset&limit
+    POST /corpora/{corpus}/lesson_plan     {"whole_corpus"}
+    GET  /metrics, GET /healthz
+
+The retrieval, LLM and generation code is synchronous, so the event loop
+hands it to a thread pool. Two things sit in front of that pool. Identical
+concurrent requests are coalesced into one run whose result every caller
+receives, e.g. a whole class asking for the same quiz at once. Admission
+control allows SERVER_WORKERS runs at a time and SERVER_MAX_PENDING waiting;
+beyond that the server answers 503 with Retry-After instead of queueing
+without bound.
+
+    OPENAI_API_KEY=... python server.py [--host 127.0.0.1] [--port 8080]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+
+from aiohttp import web
+
+import resources
+import workspace
+from artifact_store import get_artifact_store
+from document_processor import DocumentProcessor
+from jobs import get_job_runner, ingest_job
+from metrics import get_metrics
+from study_artifacts import build_flashcards, build_lesson_plan, build_quiz
+from config import (
+    DEFAULT_MODEL, ARTIFACT_PAGE_SIZE, UPLOAD_COPY_BUFFER, SERVER_HOST, SERVER_PORT, SERVER_WORKERS,
+    SERVER_MAX_PENDING, SERVER_REQUEST_TIMEOUT, SERVER_MAX_UPLOAD_BYTES, SERVER_MAX_OPEN_CORPORA
+)
+
+logger = logging.getLogger(__name__)
+
+CORPUS_ID = re.compile(r'[0-9a-f]{32}')
+ARTIFACT_KINDS = ('flashcards', 'quiz', 'lesson_plan')
+
+
+class ServerBusy(Exception):
+    pass
+
+
+def _error(status, message: str):
+    return status(text=json.dumps({'error': message}), content_type='application/json')
+
+
+class SingleFlight:
+    """Shares one in-flight call between all concurrent callers with the same key.
+
+    The shared call is shielded: a caller that disconnects or times out stops
+    waiting, but the others still get the result.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, make):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._calls.pop(key) if self._calls.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+class Admission:
+    """Runs at most ``limit`` tasks at once and lets at most ``max_pending`` wait; the rest get 503."""
+
+    def __init__(self, limit: int, max_pending: int):
+        self._semaphore = asyncio.Semaphore(limit)
+        self.max_pending = max_pending
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self.waiting >= self.max_pending:
+            self.rejected += 1
+            raise ServerBusy()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+
+class StudyService:
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, vector_store=None, chat_engine=None,
+                 generators=None, job_runner=None, artifact_store=None, workers: int = SERVER_WORKERS,
+                 max_pending: int = SERVER_MAX_PENDING, coalesce: bool = True):
+        self.vector_store = vector_store or resources.get_vector_store(api_key)
+        self.chat_engine = chat_engine or resources.get_chat_engine(api_key, model)
+        self.generators = generators or {
+            'flashcards': resources.get_flashcard_generator(api_key, model),
+            'quiz': resources.get_quiz_generator(api_key, model),
+            'lesson_plan': resources.get_lesson_plan_generator(api_key, model),
+        }
+        self.job_runner = job_runner or get_job_runner()
+        self.artifact_store = artifact_store or get_artifact_store()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self.workers = workers
+        self.admission = Admission(workers, max_pending)
+        self.flight = SingleFlight()
+        self.coalesce = coalesce
+        self._retrievers = OrderedDict()
+
+    async def run(self, key, fn, *args):
+        """Run blocking ``fn(*args)`` on the worker pool; concurrent calls with the same ``key`` share one run."""
+        loop = asyncio.get_running_loop()
+
+        def finished(future):
+            self.admission.release()
+            if not future.cancelled():
+                # Retrieve it so a result nobody waits for any more isn't logged as lost
+                future.exception()
+
+        async def work():
+            await self.admission.acquire()
+            # A thread can't be interrupted: when the caller times out, the slot
+            # stays taken until the thread actually finishes
+            future = loop.run_in_executor(self.executor, fn, *args)
+            future.add_done_callback(finished)
+            return await asyncio.shield(future)
+
+        call = self.flight.do(key, work) if self.coalesce and key is not None else work()
+        try:
+            return await asyncio.wait_for(call, SERVER_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise _error(web.HTTPGatewayTimeout, "Timed out")
+
+    async def retriever(self, corpus: str):
+        store_dir = workspace.corpus_dir(corpus) if CORPUS_ID.fullmatch(corpus) else None
+        if store_dir is None or not workspace.is_ready(store_dir):
+            self._retrievers.pop(corpus, None)
+            raise _error(web.HTTPNotFound, f"Unknown corpus: {corpus}")
+        # Keep the corpus from being garbage-collected while it is served
+        workspace.touch(store_dir)
+        retriever = self._retrievers.get(corpus)
+        if retriever is None:
+            retriever = await self.run(('open', corpus), self.vector_store.open_local_store, store_dir)
+            self._retrievers[corpus] = retriever
+            while len(self._retrievers) > SERVER_MAX_OPEN_CORPORA:
+                self._retrievers.popitem(last=False)
+        else:
+            self._retrievers.move_to_end(corpus)
+        return retriever
+
+    # Handlers
+
+    async def health(self, request):
+        return web.json_response({
+            'status': 'ok', 'workers': self.workers, 'waiting': self.admission.waiting,
+            'rejected': self.admission.rejected, 'in_flight': len(self.flight), 'coalesced': self.flight.coalesced,
+        })
+
+    async def metrics(self, request):
+        return web.Response(text=get_metrics().prometheus_text(), content_type='text/plain')
+
+    async def ingest(self, request):
+        if not request.content_type.startswith('multipart/'):
+            raise _error(web.HTTPBadRequest, "Upload PDFs as multipart/form-data")
+        upload_dir = workspace.session_dir(f"api-{uuid.uuid4().hex}")
+        try:
+            paths = await self._save_uploads(await request.multipart(), upload_dir)
+            key = await self.run(None, lambda: self.vector_store.corpus_dir(paths).name)
+        except BaseException:
+            DocumentProcessor.cleanup_temp_files(upload_dir)
+            raise
+        # The job and artifact stores are SQLite, so their calls go to the
+        # default executor like upload I/O rather than blocking the loop
+        loop = asyncio.get_running_loop()
+        job_id, created = await loop.run_in_executor(
+            None, self.job_runner.submit, key, ingest_job(self.vector_store, paths, upload_dir)
+        )
+        if not created:
+            DocumentProcessor.cleanup_temp_files(upload_dir)
+        return web.json_response({'job': job_id, 'corpus': key}, status=202)
+
+    @staticmethod
+    async def _save_uploads(reader, upload_dir: Path):
+        # File I/O goes to the default executor, off the event loop and
+        # outside the worker slots that admission control hands out
+        loop = asyncio.get_running_loop()
+        paths, taken, total = [], set(), 0
+        while (part := await reader.next()) is not None:
+            if not part.filename or not part.filename.lower().endswith('.pdf'):
+                continue
+            path = upload_dir.joinpath(DocumentProcessor.upload_name(part.filename, taken))
+            f = await loop.run_in_executor(None, open, path, 'wb')
+            try:
+                while chunk := await part.read_chunk(UPLOAD_COPY_BUFFER):
+                    total += len(chunk)
+                    if total > SERVER_MAX_UPLOAD_BYTES:
+                        raise _error(web.HTTPRequestEntityTooLarge, "Upload too large")
+                    await loop.run_in_executor(None, f.write, chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
+            paths.append(path)
+        if not paths:
+            raise _error(web.HTTPBadRequest, "No PDF files in the upload")
+        return paths
+
+    async def job(self, request):
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(None, self.job_runner.get, request.match_info['job'])
+        if job is None:
+            raise _error(web.HTTPNotFound, "Unknown job")
+        return web.json_response({**asdict(job), 'active': job.active})
+
+    async def search(self, request):
+        corpus, query = request.match_info['corpus'], await self._query(request)
+        retriever = await self.retriever(corpus)
+        documents = await self.run(('search', corpus, query), retriever.invoke, query)
+        return web.json_response([{'content': doc.page_content, 'metadata': doc.metadata} for doc in documents])
+
+    async def chat(self, request):
+        corpus, query = request.match_info['corpus'], await self._query(request)
+        retriever = await self.retriever(corpus)
+        return web.json_response(await self.run(('chat', corpus, query), self._answer, retriever, query))
+
+    def _answer(self, retriever, query: str) -> dict:
+        timings = []
+        answer = "".join(self.chat_engine.stream_answer(retriever, query, on_timing=timings.append))
+        return {'answer': answer, 'cached': timings[0].cached, 'seconds': round(timings[0].total_latency, 3)}
+
+    async def artifact(self, request):
+        corpus, kind = request.match_info['corpus'], request.match_info['kind']
+        body = await self._body(request)
+        whole_corpus = bool(body.get('whole_corpus', False)) and kind != 'flashcards'
+        try:
+            offset = int(request.query.get('offset', 0))
+            limit = int(request.query.get('limit', ARTIFACT_PAGE_SIZE))
+        except ValueError:
+            raise _error(web.HTTPBadRequest, "offset and limit must be integers")
+        retriever = await self.retriever(corpus)
+        artifact_id = await self.run((kind, corpus, whole_corpus), self._build, kind, retriever, whole_corpus)
+        if artifact_id is None:
+            raise _error(web.HTTPUnprocessableEntity, f"Could not generate {kind}")
+        loop = asyncio.get_running_loop()
+        return web.json_response(await loop.run_in_executor(None, self._page, artifact_id, offset, limit))
+
+    def _page(self, artifact_id: str, offset: int, limit: int) -> dict:
+        return {
+            'id': artifact_id,
+            'size': self.artifact_store.size(artifact_id),
+            'items': self.artifact_store.page(artifact_id, offset, limit),
+        }
+
+    def _build(self, kind: str, retriever, whole_corpus: bool):
+        generator = self.generators[kind]
+        if kind == 'flashcards':
+            artifact_id, _ = build_flashcards(retriever, generator, store=self.artifact_store)
+        elif kind == 'quiz':
+            artifact_id, _ = build_quiz(retriever, generator, whole_corpus, store=self.artifact_store)
+        else:
+            artifact_id, _ = build_lesson_plan(retriever, generator, whole_corpus, store=self.artifact_store)
+        return artifact_id
+
+    @staticmethod
+    async def _body(request) -> dict:
+        if not request.can_read_body:
+            return {}
+        try:
+            body = await request.json()
+        except ValueError:
+            raise _error(web.HTTPBadRequest, "Body must be JSON")
+        if not isinstance(body, dict):
+            raise _error(web.HTTPBadRequest, "Body must be a JSON object")
+        return body
+
+    async def _query(self, request) -> str:
+        query = " ".join(str((await self._body(request)).get('query', '')).split())
+        if not query:
+            raise _error(web.HTTPBadRequest, "query is required")
+        return query
+
+
+@web.middleware
+async def json_errors(request, handler):
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except ServerBusy:
+        # Raised once per coalesced run, so every waiting caller gets its own response
+        return web.json_response({'error': "Server busy, retry later"}, status=503, headers={'Retry-After': '1'})
+    except Exception as e:
+        logger.error(f"{request.method} {request.path} failed: {str(e)}")
+        return web.json_response({'error': str(e)}, status=500)
+
+
+def create_app(service: StudyService) -> web.Application:
+    app = web.Application(middlewares=[json_errors])
+    app.add_routes([
+        web.get('/healthz', service.health),
+        web.get('/metrics', service.metrics),
+        web.post('/corpora', service.ingest),
+        web.get('/jobs/{job}', service.job),
+        web.post('/corpora/{corpus}/search', service.search),
+        web.post('/corpora/{corpus}/chat', service.chat),
+        web.post(f"/corpora/{{corpus}}/{{kind:{'|'.join(ARTIFACT_KINDS)}}}", service.artifact),
+    ])
+
+    async def shutdown(app):
+        service.executor.shutdown(wait=False, cancel_futures=True)
+    app.on_cleanup.append(shutdown)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=SERVER_MAX_PENDING)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY", ""),
+                        help="OpenAI API key (default: $OPENAI_API_KEY)")
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("An OpenAI API key is required (--api-key or OPENAI_API_KEY)")
+
+    logging.basicConfig(level=logging.INFO)
+    service = StudyService(args.api_key, args.model, workers=args.workers, max_pending=args.max_pending)
+    web.run_app(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from dataclasses import asdict
+from typing import Optional, Tuple
+from artifact_store import ArtifactStore, get_artifact_store
+from chunk_selection import select_diverse_chunks
+from context_packer import pack_context
+from map_reduce import MapReduceGenerator
+from review_scheduler import card_key
+from config import (
+    FLASHCARD_CONCURRENCY, FLASHCARD_DECK_SIZE, FLASHCARD_SELECTION, MAP_REDUCE_CONCURRENCY, RETRIEVER_K
+)
+
+# Find-or-build for the flashcards, lesson plan and quiz of one corpus. The app
+# and the batch CLI both go through here, so an artifact built by either is
+# found by the other under the same corpus version and settings.
+
+
+def corpus_version(retriever) -> str:
+    return (retriever.metadata or {}).get('corpus_version', '')
+
+
+def corpus_documents(retriever):
+    # Imported here so the vector store stack stays off the app's startup path
+    from vector_store import store_documents
+    return store_documents(retriever.vectorstore)
+
+
+def flashcard_settings(generator, count: int = FLASHCARD_DECK_SIZE) -> dict:
+    return dict(model=generator.chat.model_name, selection=FLASHCARD_SELECTION, count=count)
+
+
+def generation_settings(generator, whole_corpus: bool = False) -> dict:
+    return dict(model=generator.model, whole_corpus=whole_corpus)
+
+
+def quiz_items(quiz_data: dict):
+    return [(None, {"question": q, "answer": a, "difficulty": d})
+            for q, a, d in zip(quiz_data["questions"], quiz_data["answers"], quiz_data["difficulty"])]
+
+
+def build_flashcards(retriever, generator, count: int = FLASHCARD_DECK_SIZE,
+                     max_concurrency: int = FLASHCARD_CONCURRENCY,
+                     store: Optional[ArtifactStore] = None) -> Tuple[Optional[int], bool]:
+    """Return (deck id, whether it was generated now); the id is None if no card could be generated."""
+    store = store or get_artifact_store()
+    settings = flashcard_settings(generator, count)
+    deck_id = store.find(corpus_version(retriever), 'flashcards', **settings)
+    if deck_id is not None:
+        return deck_id, False
+
+    # Pick chunks that cover distinct topics; the extra ones stand in for failed generations
+    contents = []
+    for doc in select_diverse_chunks(retriever.vectorstore, 2 * count):
+        content = doc.page_content[:200].strip()
+        if content and content not in contents:
+            contents.append(content)
+
+    # Generate in concurrent batches until we have enough flashcards
+    flashcards = []
+    while contents and len(flashcards) < count:
+        batch = contents[:count - len(flashcards)]
+        contents = contents[len(batch):]
+        for flashcard in generator.generate_flashcards(batch, max_concurrency=max_concurrency):
+            if flashcard and flashcard.input_expression:  # Verify valid flashcard
+                flashcards.append(flashcard)
+    if not flashcards:
+        return None, False
+    items = [(card_key(card), asdict(card)) for card in flashcards]
+    return store.save(corpus_version(retriever), 'flashcards', items, **settings), True
+
+
+def build_lesson_plan(retriever, planner, whole_corpus: bool = False,
+                      max_concurrency: int = MAP_REDUCE_CONCURRENCY,
+                      store: Optional[ArtifactStore] = None) -> Tuple[int, bool]:
+    store = store or get_artifact_store()
+    settings = generation_settings(planner, whole_corpus)
+    plan_id = store.find(corpus_version(retriever), 'lesson_plan', **settings)
+    if plan_id is not None:
+        return plan_id, False
+    if whole_corpus:
+        plan = MapReduceGenerator(planner, max_concurrency).generate_plan(corpus_documents(retriever))
+    else:
+        documents = select_diverse_chunks(retriever.vectorstore, RETRIEVER_K)
+        plan = planner.generate_plan(pack_context(documents, planner.context_budget(), model=planner.model))
+    return store.save(corpus_version(retriever), 'lesson_plan', [(None, plan)], **settings), True
+
+
+def build_quiz(retriever, quiz_gen, whole_corpus: bool = False,
+               max_concurrency: int = MAP_REDUCE_CONCURRENCY,
+               store: Optional[ArtifactStore] = None) -> Tuple[int, bool]:
+    store = store or get_artifact_store()
+    settings = generation_settings(quiz_gen, whole_corpus)
+    quiz_id = store.find(corpus_version(retriever), 'quiz', **settings)
+    if quiz_id is not None:
+        return quiz_id, False
+    if whole_corpus:
+        quiz_data = MapReduceGenerator(quiz_gen, max_concurrency).generate_quiz(corpus_documents(retriever))
+    else:
+        documents = select_diverse_chunks(retriever.vectorstore, RETRIEVER_K)
+        quiz_data = quiz_gen.generate_quiz(pack_context(documents, quiz_gen.context_budget(), model=quiz_gen.model))
+    return store.save(corpus_version(retriever), 'quiz', quiz_items(quiz_data), **settings), True
+
+
+def find_artifacts(retriever, flashcards=None, planner=None, quiz_gen=None,
+                   store: Optional[ArtifactStore] = None) -> dict:
+    """Ids of already built artifacts with the default settings, by kind, without generating anything."""
+    store = store or get_artifact_store()
+    version = corpus_version(retriever)
+    found = {}
+    if flashcards is not None:
+        found['flashcards'] = store.find(version, 'flashcards', **flashcard_settings(flashcards))
+    if planner is not None:
+        found['lesson_plan'] = store.find(version, 'lesson_plan', **generation_settings(planner))
+    if quiz_gen is not None:
+        found['quiz'] = store.find(version, 'quiz', **generation_settings(quiz_gen))
+    return found
@@ -0,0 +1,95 @@
+import re
+from typing import List, NamedTuple, Sequence
+from langchain_core.documents import Document
+from context_packer import get_encoding
+from config import DEFAULT_MODEL, CHUNK_TOKENS, PARAGRAPH_BREAK_FILL
+
+# A segment ends after sentence punctuation or at a blank line
+_SEGMENT_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n\s*")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+
+
+class ChunkSpan(NamedTuple):
+    doc_id: int
+    start: int
+    end: int
+
+
+class OffsetTokenSplitter:
+    """Splits text into chunks of at most ``chunk_tokens`` tokens along sentence
+    and paragraph boundaries, returning (doc_id, start, end) character offsets
+    instead of copying text.
+
+    Texts are cut into sentence segments with one regex pass, all segments are
+    token-counted in a single ``encode_ordinary_batch`` call, and segments are
+    packed greedily. A chunk that is at least ``paragraph_fill`` full is closed
+    early at a paragraph break. Sentences longer than a whole chunk are cut at
+    token boundaries.
+    """
+
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, model: str = DEFAULT_MODEL,
+                 paragraph_fill: float = PARAGRAPH_BREAK_FILL):
+        self.chunk_tokens = chunk_tokens
+        self.paragraph_fill = paragraph_fill
+        self.encoding = get_encoding(model)
+
+    @staticmethod
+    def _segments(text: str):
+        """Yield (start, end, ends_paragraph) for each sentence segment of ``text``."""
+        start = 0
+        for match in _SEGMENT_END.finditer(text):
+            if match.end() > start:
+                yield start, match.end(), bool(_PARAGRAPH.search(match.group()))
+                start = match.end()
+        if start < len(text):
+            yield start, len(text), True
+
+    def split_spans(self, texts: Sequence[str]) -> List[ChunkSpan]:
+        segments = [(doc_id, start, end, paragraph)
+                    for doc_id, text in enumerate(texts)
+                    for start, end, paragraph in self._segments(text)]
+        counts = self.encoding.encode_ordinary_batch(
+            [texts[doc_id][start:end] for doc_id, start, end, _ in segments]
+        )
+
+        spans = []
+        current_doc, current_start, current_end, used = None, 0, 0, 0
+        limit = self.chunk_tokens
+        for (doc_id, start, end, paragraph), tokens in zip(segments, counts):
+            size = len(tokens)
+            if current_doc is not None and (doc_id != current_doc or used + size > limit):
+                spans.append(ChunkSpan(current_doc, current_start, current_end))
+                current_doc = None
+            if size > limit:
+                spans.extend(self._split_long(doc_id, start, tokens))
+                continue
+            if current_doc is None:
+                current_doc, current_start, used = doc_id, start, 0
+            current_end = end
+            used += size
+            if paragraph and used >= self.paragraph_fill * limit:
+                spans.append(ChunkSpan(current_doc, current_start, current_end))
+                current_doc = None
+        if current_doc is not None:
+            spans.append(ChunkSpan(current_doc, current_start, current_end))
+        return spans
+
+    def _split_long(self, doc_id: int, start: int, tokens: List[int]) -> List[ChunkSpan]:
+        text, offsets = self.encoding.decode_with_offsets(tokens)
+        offsets = list(offsets) + [len(text)]
+        return [ChunkSpan(doc_id, start + offsets[i], start + offsets[min(i + self.chunk_tokens, len(tokens))])
+                for i in range(0, len(tokens), self.chunk_tokens)]
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Materialise chunks as Documents, recording their offsets in the metadata."""
+        texts = [doc.page_content for doc in documents]
+        chunks = []
+        for doc_id, start, end in self.split_spans(texts):
+            raw = texts[doc_id][start:end]
+            content = raw.strip()
+            if content:
+                # Offsets cover the stripped content, so text[start_index:end_index] == page_content
+                start += len(raw) - len(raw.lstrip())
+                metadata = dict(documents[doc_id].metadata, start_index=start, end_index=start + len(content))
+                chunks.append(Document(page_content=content, metadata=metadata))
+        return chunks
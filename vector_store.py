@@ -1,19 +1,52 @@
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma, Pinecone
-import pinecone
-from config import LOCAL_VECTOR_STORE_DIR, RETRIEVER_K
+from config import LOCAL_VECTOR_STORE_DIR, LOCAL_VECTOR_STORE_BACKEND, RETRIEVER_K, HYBRID_RETRIEVAL, PDF_WORKERS
+from embedding_cache import CachedEmbeddings
+from ingest_manifest import IngestManifest, file_hash
+from ingest_pipeline import IngestPipeline
+from document_processor import DocumentProcessor
+from lexical_index import BM25Index, HybridRetriever
+from plugins import LazyRegistry, load_object
+from metrics import stage
+import workspace
+from langchain_core.documents import Document
+import logging
 import shutil
+from pathlib import Path
+
+# Vector store backends are imported on first use; the app only ever needs
+# one of them, and each pulls in a heavy client library.
+VECTOR_STORE_BACKENDS = LazyRegistry('vector store backend', {
+    'chroma': 'langchain_community.vectorstores:Chroma',
+    'pinecone': 'langchain_community.vectorstores:Pinecone',
+    'numpy': 'numpy_store:NumpyVectorStore',
+})
+
+logger = logging.getLogger(__name__)
+
+
+def store_documents(vectordb):
+    """Every chunk in a local store (Chroma or NumPy), ordered by source and page."""
+    data = vectordb.get(include=['documents', 'metadatas'])
+    docs = [Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(data['ids'], data['documents'], data['metadatas'])]
+    docs.sort(key=lambda doc: (str(doc.metadata.get('source', '')), doc.metadata.get('page', 0)))
+    return docs
 
 class VectorStore:
-    def __init__(self, openai_api_key: str):
-        self.embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
+    def __init__(self, openai_api_key: str, http_client=None, embeddings=None, store_dir=LOCAL_VECTOR_STORE_DIR,
+                 pdf_workers: int = PDF_WORKERS):
+        if embeddings is None:
+            OpenAIEmbeddings = load_object('langchain_openai:OpenAIEmbeddings')
+            embeddings = CachedEmbeddings(OpenAIEmbeddings(openai_api_key=openai_api_key, http_client=http_client))
+        self.embeddings = embeddings
+        self.store_dir = Path(store_dir)
+        self.pdf_workers = pdf_workers
 
     def clear_local_store(self):
         """Clear the local vector store directory"""
         try:
-            if LOCAL_VECTOR_STORE_DIR.exists():
-                shutil.rmtree(LOCAL_VECTOR_STORE_DIR)
-            LOCAL_VECTOR_STORE_DIR.mkdir(parents=True, exist_ok=True)
+            if self.store_dir.exists():
+                shutil.rmtree(self.store_dir)
+            self.store_dir.mkdir(parents=True, exist_ok=True)
         except Exception as e:
             raise Exception(f"Failed to clear vector store: {str(e)}")
 
@@ -21,17 +54,142 @@ class VectorStore:
         # Clear existing vector store before creating new one
         # self.clear_local_store()
         # print("cleared storage")
+        Chroma = VECTOR_STORE_BACKENDS.get('chroma')
         vectordb = Chroma.from_documents(
             documents=texts,
             embedding=self.embeddings,
-            persist_directory=LOCAL_VECTOR_STORE_DIR.as_posix()
+            persist_directory=self.store_dir.as_posix()
         )
-        print("Vector done")
+        logger.info("Vector store created")
+        self.embeddings.log_stats()
         vectordb.persist()
         return vectordb.as_retriever(search_kwargs={'k': RETRIEVER_K})
 
+    @staticmethod
+    def corpus_settings() -> dict:
+        """Backend and splitter settings an index is built with"""
+        return {'backend': LOCAL_VECTOR_STORE_BACKEND, **DocumentProcessor.split_settings()}
+
+    def corpus_dir(self, paths) -> Path:
+        """Index directory for exactly ``paths`` with the current backend and splitter settings"""
+        return workspace.corpus_dir(workspace.corpus_id(paths, self.corpus_settings()))
+
+    def open_corpus(self, paths, progress=None, cancel=None):
+        """Retriever over exactly ``paths``, sharing one index between all sessions with the same documents.
+
+        The first session to upload a corpus builds its index under the corpus
+        lock; anyone else waits for it and then opens the finished index
+        read-only. A new corpus starts as a copy of the ready corpus sharing
+        the most files with it, so only the files that differ are parsed and
+        embedded. A build that fails or is cancelled is never marked
+        ready; chunk IDs are deterministic, so the next attempt overwrites
+        whatever it left behind.
+        """
+        store_dir = self.corpus_dir(paths)
+        with workspace.corpus_lock(store_dir):
+            if workspace.is_ready(store_dir):
+                workspace.touch(store_dir)
+                logger.info(f"Vector store: reusing corpus {store_dir.name}")
+                return self.open_local_store(store_dir)
+            self._seed_corpus(paths, store_dir)
+            retriever = self.sync_local_store(paths, store_dir, progress=progress, cancel=cancel)
+            workspace.mark_ready(store_dir)
+            return retriever
+
+    def _seed_corpus(self, paths, store_dir: Path):
+        """Copy the ready corpus with the most files in common with ``paths`` into an empty ``store_dir``"""
+        if store_dir.exists() and any(store_dir.iterdir()):
+            # A failed build left its own state; the sync picks up from there
+            return
+        wanted = {Path(path).name: file_hash(Path(path)) for path in paths}
+        settings = self.corpus_settings()
+        best, best_score = None, (0, 0)
+        for candidate in workspace.ready_corpora():
+            manifest = IngestManifest(candidate)
+            if manifest.settings != settings:
+                continue
+            shared = sum(wanted.get(name) == entry['hash'] for name, entry in manifest.files.items())
+            # Most shared files first, then fewest files to remove
+            score = (shared, shared - len(manifest.files))
+            if shared and score > best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return
+        with workspace.corpus_lock(best, blocking=False) as locked:
+            # Skip rather than wait if it is being collected
+            if not locked or not workspace.is_ready(best):
+                return
+            workspace.touch(best)
+            shutil.copytree(best, store_dir, dirs_exist_ok=True,
+                            ignore=shutil.ignore_patterns(workspace.READY_NAME, workspace.PINNED_NAME))
+        logger.info(f"Vector store: seeded corpus {store_dir.name} from {best.name} ({best_score[0]} shared files)")
+
+    def open_local_store(self, store_dir=None):
+        """Retriever over an existing store, without touching its contents"""
+        store_dir = Path(store_dir or self.store_dir)
+        LocalStore = VECTOR_STORE_BACKENDS.get(LOCAL_VECTOR_STORE_BACKEND)
+        vectordb = LocalStore(persist_directory=store_dir.as_posix(), embedding_function=self.embeddings)
+        index = BM25Index.load(store_dir)
+        return self._retriever(vectordb, index, IngestManifest(store_dir).version, store_dir)
+
+    def sync_local_store(self, paths, store_dir=None, progress=None, cancel=None):
+        """Upsert new or changed files into the local store and drop chunks of removed ones"""
+        store_dir = Path(store_dir or self.store_dir)
+        LocalStore = VECTOR_STORE_BACKENDS.get(LOCAL_VECTOR_STORE_BACKEND)
+        vectordb = LocalStore(
+            persist_directory=store_dir.as_posix(),
+            embedding_function=self.embeddings
+        )
+        manifest = IngestManifest(store_dir)
+        index = BM25Index.load(store_dir)
+        # Stores built with different backend or splitter settings are re-indexed in full
+        settings = self.corpus_settings()
+        rebuild = bool(manifest.files) and manifest.settings != settings
+        changed, removed = manifest.diff(paths, force=rebuild)
+        manifest.settings = settings
+
+        stale_ids = []
+        for name in removed:
+            stale_ids.extend(manifest.chunk_ids(name))
+            manifest.forget(name)
+        for path in changed:
+            stale_ids.extend(manifest.chunk_ids(path.name))
+        if stale_ids:
+            with stage('delete_stale') as record:
+                vectordb.delete(ids=stale_ids)
+                index.delete(stale_ids)
+                record.items = len(stale_ids)
+
+        chunk_ids = IngestPipeline(vectordb, sinks=[index], progress=progress, cancel=cancel,
+                                   pdf_workers=self.pdf_workers).run(changed)
+        for path, digest in changed.items():
+            manifest.record(path.name, digest, chunk_ids[path])
+
+        with stage('persist'):
+            index.save()
+            manifest.save()
+            vectordb.persist()
+        logger.info(f"Vector sync: {len(changed)} changed, {len(removed)} removed")
+        self.embeddings.log_stats()
+        return self._retriever(vectordb, index, manifest.version, store_dir)
+
+    @staticmethod
+    def _retriever(vectordb, index=None, corpus_version=None, store_dir=None):
+        # The corpus version lets answer caches tell when the documents changed;
+        # the store dir lets sessions keep a shared corpus from being collected
+        metadata = {'corpus_version': corpus_version} if corpus_version else {}
+        if store_dir is not None:
+            metadata['store_dir'] = Path(store_dir).as_posix()
+        metadata = metadata or None
+        dense = vectordb.as_retriever(search_kwargs={'k': RETRIEVER_K}, metadata=metadata)
+        if not HYBRID_RETRIEVAL or index is None:
+            return dense
+        return HybridRetriever(dense=dense, index=index, vectorstore=vectordb, k=RETRIEVER_K, metadata=metadata)
+
     def create_pinecone_store(self, texts, api_key: str, environment: str, index_name: str):
+        pinecone = load_object('pinecone')
         pinecone.init(api_key=api_key, environment=environment)
+        Pinecone = VECTOR_STORE_BACKENDS.get('pinecone')
         vectordb = Pinecone.from_documents(
             documents=texts,
             embedding=self.embeddings,
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+from ingest_manifest import file_hash
+from config import TMP_DIR, CORPUS_STORE_DIR, WORKSPACE_IDLE_SECONDS, WORKSPACE_GC_INTERVAL
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; locking is then per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+READY_NAME = 'READY'
+PINNED_NAME = 'PINNED'
+
+_gc_lock = threading.Lock()
+_last_gc = 0.0
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+# Namespaced storage so concurrent sessions never share mutable state:
+#   TMP_DIR/<session id>/          uploads of one session, removed after ingestion
+#   CORPUS_STORE_DIR/<corpus id>/  one index per distinct set of documents, read-only once READY;
+#                                  PINNED ones (prebuilt by cli.py) are never collected
+
+
+def session_dir(session_id: str) -> Path:
+    path = TMP_DIR.joinpath(session_id)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def corpus_id(paths: Iterable[Path], settings: Optional[dict] = None) -> str:
+    """Hash of the documents' contents (not their names) plus the settings the index is built with."""
+    digests = sorted({file_hash(Path(path)) for path in paths})
+    payload = json.dumps({'files': digests, 'settings': settings or {}}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def corpus_dir(corpus: str) -> Path:
+    return CORPUS_STORE_DIR.joinpath(corpus)
+
+
+def is_ready(store_dir: Path) -> bool:
+    return store_dir.joinpath(READY_NAME).exists()
+
+
+def ready_corpora() -> Iterator[Path]:
+    if CORPUS_STORE_DIR.exists():
+        for store_dir in CORPUS_STORE_DIR.iterdir():
+            if store_dir.is_dir() and is_ready(store_dir):
+                yield store_dir
+
+
+def mark_ready(store_dir: Path):
+    store_dir.joinpath(READY_NAME).touch()
+
+
+def pin(store_dir: Path):
+    """Keep ``store_dir`` out of garbage collection however long it stays unused."""
+    store_dir.joinpath(PINNED_NAME).touch()
+
+
+def is_pinned(store_dir: Path) -> bool:
+    return store_dir.joinpath(PINNED_NAME).exists()
+
+
+def touch(store_dir: Path):
+    """Record that a session is still using ``store_dir``, keeping it from garbage collection."""
+    try:
+        os.utime(store_dir.joinpath(READY_NAME))
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def corpus_lock(store_dir: Path, blocking: bool = True):
+    """Exclusive build/delete lock for one corpus, across threads and processes.
+
+    Yields False instead of waiting when ``blocking`` is off and the lock is held.
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(store_dir.name, threading.Lock())
+    if not thread_lock.acquire(blocking):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            yield True
+            return
+        store_dir.parent.mkdir(parents=True, exist_ok=True)
+        with open(store_dir.with_name(f"{store_dir.name}.lock"), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+
+def _last_used(store_dir: Path) -> float:
+    marker = store_dir.joinpath(READY_NAME)
+    try:
+        return (marker if marker.exists() else store_dir).stat().st_mtime
+    except FileNotFoundError:
+        return float('inf')
+
+
+def collect_garbage(max_idle: float = WORKSPACE_IDLE_SECONDS, force: bool = False) -> int:
+    """Delete corpus indexes and session upload dirs idle for more than ``max_idle`` seconds.
+
+    Runs at most once per WORKSPACE_GC_INTERVAL per process unless ``force``
+    is set. Corpora being built or deleted elsewhere are skipped. Returns
+    the number of directories removed.
+    """
+    global _last_gc
+    with _gc_lock:
+        now = time.time()
+        if not force and now - _last_gc < WORKSPACE_GC_INTERVAL:
+            return 0
+        _last_gc = now
+
+    removed = 0
+    cutoff = time.time() - max_idle
+    if CORPUS_STORE_DIR.exists():
+        for store_dir in CORPUS_STORE_DIR.iterdir():
+            if not store_dir.is_dir() or is_pinned(store_dir) or _last_used(store_dir) > cutoff:
+                continue
+            with corpus_lock(store_dir, blocking=False) as locked:
+                # Re-check under the lock: a session may have opened it meanwhile
+                if locked and _last_used(store_dir) <= cutoff:
+                    shutil.rmtree(store_dir, ignore_errors=True)
+                    removed += 1
+    if TMP_DIR.exists():
+        for upload_dir in TMP_DIR.iterdir():
+            if upload_dir.is_dir() and upload_dir.stat().st_mtime <= cutoff:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+                removed += 1
+    if removed:
+        logger.info(f"Workspace GC: removed {removed} idle directories")
+    return removed